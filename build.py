@@ -42,6 +42,7 @@ build_exe_options = {
         "asyncio",
         "json",
         "sqlite3",
+        "watchdog",
         "fastapi",
         "uvicorn",
         "h11",
@@ -1,40 +1,16 @@
-import os, sys, argparse, json, subprocess, shutil
+import os, sys, re, math, argparse, json, subprocess, shutil, threading
 from pathlib import Path
 from datetime import datetime
-import xml.etree.ElementTree as ET
 from fractions import Fraction
 
-
-def _install_no_console_wrapper():
-    if os.name != "nt":
-        return
-
-    CREATE_NO_WINDOW = 0x08000000
-    STARTF_USESHOWWINDOW = 0x00000001
-    SW_HIDE = 0
-
-    _si = subprocess.STARTUPINFO()
-    _si.dwFlags |= STARTF_USESHOWWINDOW
-    _si.wShowWindow = SW_HIDE
-
-    _orig_popen = subprocess.Popen
-    _orig_run = subprocess.run
-
-    def _popen_no_window(*args, **kwargs):
-        kwargs.setdefault("startupinfo", _si)
-        kwargs.setdefault("creationflags", CREATE_NO_WINDOW)
-        return _orig_popen(*args, **kwargs)
-
-    def _run_no_window(*args, **kwargs):
-        kwargs.setdefault("startupinfo", _si)
-        kwargs.setdefault("creationflags", CREATE_NO_WINDOW)
-        return _orig_run(*args, **kwargs)
-
-    subprocess.Popen = _popen_no_window
-    subprocess.run = _run_no_window
+try:
+    import orjson
+except Exception:
+    orjson = None
 
 
-_install_no_console_wrapper()
+# -------- no-console subprocess kwargs (Windows) --------
+from utils.proc import POPEN_KW  # noqa
 
 
 # -------- console UTF-8 (Windows) --------
@@ -60,6 +36,12 @@ except Exception:
         return []
 
 
+# -------- deteksi NVENC & argumen hwaccel (dipakai bersama utils/ffmpegtools) --------
+from utils.hwaccel import has_nvenc, hwaccel_args  # noqa
+
+# -------- optional PyNvCodec engine (--engine pynvc) --------
+from utils.pynvc_engine import encode_ladder_pynvc, available as pynvc_available
+
 # -------- ladder default (16:9) --------
 RES_MAP = {
     "2160": (3840, 2160, 12000_000),
@@ -89,13 +71,81 @@ def which_ffprobe(ffmpeg_bin: str | None) -> str:
     )
 
 
+# codec sumber yang didecode NVDEC; hanya 8-bit 4:2:0 (graph scale_cuda -> nv12).
+# ProRes, 4:2:2, Hi10P, VC-1, MPEG-4 ASP dst. -> decode CPU.
+NVDEC_CODECS = {"h264", "hevc", "vp8", "vp9", "av1", "mpeg1video", "mpeg2video"}
+NVDEC_PIX_FMTS = {"yuv420p", "yuvj420p", "nv12"}
+
+
+def nvdec_ok(info: dict) -> bool:
+    """Hasil probe_all bisa didecode NVDEC dan frame-nya cocok untuk scale_cuda."""
+    return info.get("codec") in NVDEC_CODECS and info.get("pix_fmt") in NVDEC_PIX_FMTS
+
+
 def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
 
 
-def run(cmd: list[str], cwd: Path | None = None):
+# baris key=value dari `-progress pipe:2` (frame=, out_time_ms=, progress=, ...)
+_PROGRESS_KV = re.compile(r"^[a-z0-9_]+=\S*$")
+
+
+def _stderr_handler(progress: dict | None):
+    total_ms = (progress or {}).get("total_ms") or 0
+    base = (progress or {}).get("base")
+    label = (progress or {}).get("label")
+
+    def handle(line: str):
+        if not _PROGRESS_KV.match(line):
+            print(line, flush=True)
+            return
+        if progress and line.startswith("out_time_ms=") and total_ms > 0:
+            try:
+                # out_time_ms ffmpeg sebenarnya mikrodetik
+                out_ms = int(line.split("=", 1)[1]) / 1000.0
+            except ValueError:
+                return
+            pct = max(0.0, min(100.0, out_ms * 100.0 / total_ms))
+            print(f"PROGRESS base={base} rend={label} pct={pct:.2f}", flush=True)
+
+    return handle
+
+
+def _pump_stderr(stream, progress: dict | None):
+    handle = _stderr_handler(progress)
+    for raw in stream:
+        handle(raw.rstrip())
+
+
+def run(
+    cmd: list[str],
+    cwd: Path | None = None,
+    progress: dict | None = None,
+):
+    """
+    Jalankan ffmpeg; stderr dibaca thread terpisah (line-buffered).
+    progress: {total_ms, base, label} -> cetak 'PROGRESS base=.. rend=.. pct=..'.
+    """
+    if progress:
+        cmd = [cmd[0], "-progress", "pipe:2", "-nostats", *cmd[1:]]
     print(" ".join(cmd), flush=True)
-    proc = subprocess.run(cmd, cwd=str(cwd) if cwd else None)
+    proc = subprocess.Popen(
+        cmd,
+        cwd=str(cwd) if cwd else None,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        **POPEN_KW,
+    )
+    reader = threading.Thread(
+        target=_pump_stderr, args=(proc.stderr, progress), daemon=True
+    )
+    reader.start()
+    proc.wait()
+    reader.join()
     if proc.returncode != 0:
         raise RuntimeError(f"FFmpeg failed: {proc.returncode}")
 
@@ -128,40 +178,66 @@ def make_poster(ffmpeg: str, inp: Path, outdir: Path) -> str | None:
 
 
 def write_json(path: Path, data: dict):
+    """
+    Tulis atomik: tmp + fsync + rename (tidak ada file setengah jadi saat crash).
+    """
+    if orjson is not None:
+        payload = orjson.dumps(
+            data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        )
+    else:
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
     tmp = path.with_suffix(path.suffix + ".tmp")
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(tmp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
     tmp.replace(path)
 
 
-def probe_src_wh(ffprobe: str, input_path: Path) -> tuple[int, int]:
+def _derive_dar(info: dict) -> str:
+    dar = (info.get("display_aspect_ratio") or "").strip()
+    if dar and dar not in ("0:1", "N/A", "unknown"):
+        return dar
+    w = int(info.get("width") or 1920)
+    h = int(info.get("height") or 1080)
+    sar = (info.get("sample_aspect_ratio") or "1:1").strip()
     try:
-        out = subprocess.check_output(
-            [
-                ffprobe,
-                "-v",
-                "error",
-                "-select_streams",
-                "v:0",
-                "-show_entries",
-                "stream=width,height",
-                "-of",
-                "csv=p=0:s=x",
-                str(input_path),
-            ],
-            text=True,
-        ).strip()
-        w, h = out.split("x")
-        return int(w), int(h)
+        sn, sd = sar.split(":")
+        sn, sd = int(sn), int(sd)
+        if sn <= 0 or sd <= 0:
+            sn, sd = 1, 1
     except Exception:
-        return (1920, 1080)
+        sn, sd = 1, 1
+    num, den = w * sn, h * sd
+    g = math.gcd(num, den)
+    return f"{num // g}:{den // g}"
+
+
+def _rate(v: str | None) -> Fraction | None:
+    # "30000/1001" -> Fraction; "0/0", "N/A", kosong -> None
+    try:
+        r = Fraction(v)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return r if r > 0 else None
 
 
-def probe_dar(ffprobe: str, input_path: Path) -> str:
+def probe_all(ffprobe: str, input_path: Path) -> dict:
     """
-    Kembalikan 'num:den' untuk Display Aspect Ratio sumber.
-    Prefer display_aspect_ratio; fallback dari width,height dan SAR.
+    Satu kali ffprobe untuk semua metadata yang dipakai main():
+    {w, h, dar, duration_ms, codec, pix_fmt, fps (rasional "num/den"), vfr}. Fallback 1920x1080, 16:9, durasi 0.
     """
+    res = {
+        "w": 1920,
+        "h": 1080,
+        "dar": "16:9",
+        "duration_ms": 0,
+        "codec": "",
+        "pix_fmt": "",
+        "fps": "",
+        "vfr": False,
+    }
     try:
         out = subprocess.check_output(
             [
@@ -171,36 +247,40 @@ def probe_dar(ffprobe: str, input_path: Path) -> str:
                 "-select_streams",
                 "v:0",
                 "-show_entries",
-                "stream=width,height,sample_aspect_ratio,display_aspect_ratio",
+                "stream=width,height,sample_aspect_ratio,display_aspect_ratio"
+                ",codec_name,pix_fmt,avg_frame_rate,r_frame_rate:format=duration",
                 "-of",
                 "json",
                 str(input_path),
             ],
-            text=True,
+            **POPEN_KW,
         )
-        info = json.loads(out)["streams"][0]
-        dar = (info.get("display_aspect_ratio") or "").strip()
-        if dar and dar not in ("0:1", "N/A", "unknown"):
-            return dar
-        w = int(info.get("width") or 1920)
-        h = int(info.get("height") or 1080)
-        sar = (info.get("sample_aspect_ratio") or "1:1").strip()
+        data = orjson.loads(out) if orjson else json.loads(out)
+    except Exception:
+        return res
+    streams = data.get("streams") or []
+    if streams:
+        info = streams[0]
         try:
-            sn, sd = sar.split(":")
-            sn, sd = int(sn), int(sd)
-            if sn <= 0 or sd <= 0:
-                sn, sd = 1, 1
+            res["w"], res["h"] = int(info["width"]), int(info["height"])
         except Exception:
-            sn, sd = 1, 1
-        frac = Fraction(w, h) * Fraction(sn, sd)
-        frac = frac.limit_denominator(1000)
-        return f"{frac.numerator}:{frac.denominator}"
+            pass
+        try:
+            res["dar"] = _derive_dar(info)
+        except Exception:
+            pass
+        res["codec"] = info.get("codec_name") or ""
+        res["pix_fmt"] = info.get("pix_fmt") or ""
+        avg = _rate(info.get("avg_frame_rate"))
+        rfr = _rate(info.get("r_frame_rate"))
+        res["fps"] = str(avg or rfr or "")
+        # avg != r_frame_rate -> timestamp tidak rata (VFR)
+        res["vfr"] = bool(avg and rfr and avg != rfr)
+    try:
+        res["duration_ms"] = ms(float(data["format"]["duration"]))
     except Exception:
-        return "16:9"
-
-
-def even(x: int) -> int:
-    return x if x % 2 == 0 else x - 1
+        pass
+    return res
 
 
 # -------- targets & filters --------
@@ -212,13 +292,14 @@ def build_targets(renditions: list[str], mode: str, src_w: int, src_h: int):
     """
     t = []
     if mode == "source":
-        ar = (src_w / src_h) if src_h else (16 / 9)
+        # AR sebagai pecahan integer -> W dibulatkan tanpa float
+        ar_num, ar_den = (src_w, src_h) if src_h else (16, 9)
+        half = ar_den // 2
         for r in renditions:
             if r not in RES_MAP:
                 continue
-            _W, _H, br = RES_MAP[r]
-            H = _H
-            W = even(int(round(H * ar)))
+            _W, H, br = RES_MAP[r]
+            W = (H * ar_num + half) // ar_den & ~1
             t.append((W, H, br, f"{H}p"))
     else:
         for r in renditions:
@@ -229,45 +310,122 @@ def build_targets(renditions: list[str], mode: str, src_w: int, src_h: int):
     return t
 
 
-def build_filter_complex_for_targets(targets):
+def build_filter_complex_for_targets(
+    targets, gpu: bool = False, pix_fmt: str = "yuv420p"
+):
     """
     Skala langsung ke (w,h) yang sudah dihitung. Tidak crop/pad.
+    gpu=True -> frame CUDA (hwaccel), split + scale_cuda tetap di VRAM dan langsung
+    masuk NVENC (nv12, tanpa hwdownload).
+    gpu=False -> scale CPU; pix_fmt="nv12" untuk NVENC (format native, tanpa
+    konversi ulang di encoder), "yuv420p" untuk libx264/libx265.
+    Graph selalu seluruhnya CUDA atau seluruhnya CPU. Kalau rendition CPU
+    dicampur dengan GPU, sisipkan `hwdownload,format=nv12` hanya di cabang CPU
+    (setelah split, sebelum scale CPU). Sumber yang gagal di NVDEC di-encode
+    ulang oleh main() dengan gpu=False (decode + scale CPU, encode tetap NVENC).
     """
     n = len(targets)
     split = f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(n))
     chains, out_labels = [], []
     for i, (w, h, _br, _name) in enumerate(targets):
         out_lab = f"v{i}o"
-        chains.append(
-            f"[v{i}]scale=w={w}:h={h}:flags=bicubic,format=yuv420p,setsar=1[{out_lab}]"
-        )
+        if gpu:
+            chains.append(f"[v{i}]scale_cuda=w={w}:h={h}:format=nv12[{out_lab}]")
+        else:
+            chains.append(
+                f"[v{i}]scale=w={w}:h={h}:flags=bicubic,format={pix_fmt},setsar=1[{out_lab}]"
+            )
         out_labels.append(out_lab)
     fc = split + ";" + ";".join(chains)
     return fc, out_labels
 
 
-def add_stream_opts_one(args: list[str], vcodec: str, br: int):
+def add_stream_opts_one(
+    args: list[str],
+    i: int,
+    vcodec: str,
+    br: int,
+    preset: str = "medium",
+    pix_fmt: str | None = None,
+    threads: int = 0,
+):
+    """
+    Opsi encoder untuk video output ke-i (stream specifier :v:i).
+    pix_fmt hanya untuk frame software (jangan dipakai untuk frame CUDA).
+    threads hanya untuk encoder CPU (libx264/libx265); NVENC diabaikan.
+    """
     maxr = int(br * 1.07)
     buf = maxr * 2
     args += [
-        "-c:v",
+        f"-c:v:{i}",
         vcodec,
-        "-b:v",
+        f"-b:v:{i}",
         str(br),
-        "-maxrate",
+        f"-maxrate:v:{i}",
         str(maxr),
-        "-bufsize",
+        f"-bufsize:v:{i}",
         str(buf),
-        "-g",
+        f"-g:v:{i}",
         "48",
-        "-keyint_min",
+        f"-keyint_min:v:{i}",
         "48",
-        "-sc_threshold",
+        f"-sc_threshold:v:{i}",
         "0",
-        "-preset",
-        "medium",
+        f"-preset:v:{i}",
+        preset,
     ]
-    args += ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+    if pix_fmt:
+        args += [f"-pix_fmt:v:{i}", pix_fmt]
+    if threads and not vcodec.endswith("_nvenc"):
+        args += [f"-threads:v:{i}", str(threads)]
+
+
+# karakter yang harus di-escape pada nilai opsi slave / seluruh slave tee
+_TEE_OPT_SPECIAL = "\\':]"
+_TEE_SLAVE_SPECIAL = "\\'|"
+
+
+def _tee_escape(v: str, chars: str) -> str:
+    return "".join("\\" + c if c in chars else c for c in v)
+
+
+def tee_slave(opts: dict[str, str], path: str) -> str:
+    """
+    Satu slave untuk muxer tee: "[k=v:...]path".
+    Escape 2 level: nilai opsi dulu, lalu seluruh slave (dipisah '|').
+    """
+    body = ":".join(
+        f"{k}={_tee_escape(str(v), _TEE_OPT_SPECIAL)}" for k, v in opts.items()
+    )
+    return _tee_escape(f"[{body}]{path}", _TEE_SLAVE_SPECIAL)
+
+
+# -------- DASH helpers --------
+# id Representation di MPD ffmpeg (atribut pertama, angka = indeks stream)
+_DASH_REP_ID = re.compile(r'(<Representation\b[^>]*?\bid=")(\d+)(")')
+
+
+def dash_height_layout(dash_dir: Path, mpd_name: str, targets):
+    """
+    ffmpeg menamai folder segmen dengan $RepresentationID$ = indeks stream
+    (0..n-1 video). Ganti id video jadi tinggi rendition (DASH/1080/...) di MPD
+    dan rename foldernya -> layout sama dengan HLS. Audio tetap di folder n.
+    """
+    heights = {str(i): str(t[1]) for i, t in enumerate(targets)}
+    mpd_path = dash_dir / mpd_name
+    text = mpd_path.read_text(encoding="utf-8")
+    text = _DASH_REP_ID.sub(
+        lambda m: m.group(1) + heights.get(m.group(2), m.group(2)) + m.group(3), text
+    )
+    for rid, h in heights.items():
+        src, dst = dash_dir / rid, dash_dir / h
+        if src.is_dir():
+            # sisa encode sebelumnya dengan nama sama
+            shutil.rmtree(dst, ignore_errors=True)
+            os.replace(src, dst)
+    tmp = mpd_path.with_suffix(".mpd.tmp")
+    tmp.write_text(text, encoding="utf-8", newline="\n")
+    tmp.replace(mpd_path)
 
 
 # -------- HLS helpers --------
@@ -286,7 +444,15 @@ def main():
     ap.add_argument("--input", required=True)
     ap.add_argument("--outdir", required=True)
     ap.add_argument("--codec", choices=["h264", "hevc"], default="h264")
-    ap.add_argument("--gpu", action="store_true")
+    ap.add_argument("--gpu", dest="gpu", action="store_const", const=True)
+    ap.add_argument("--no-gpu", dest="gpu", action="store_const", const=False)
+    ap.add_argument("--nvenc-preset", default="p4")
+    # NVENC tanpa NVDEC/scale_cuda (build ffmpeg tanpa CUDA filter, codec sumber
+    # tidak didukung NVDEC): decode + scale di CPU, kirim nv12 ke NVENC
+    ap.add_argument("--no-hwaccel", action="store_true")
+    # total thread encoder/filter CPU (dibagi rata ke rendition); 0 = semua core
+    ap.add_argument("--threads", type=int, default=0)
+    ap.add_argument("--engine", choices=["ffmpeg", "pynvc"], default="ffmpeg")
     ap.add_argument("--renditions", default="1080,720,480")
     ap.add_argument("--no-hls", dest="hls", action="store_false")
     ap.add_argument("--no-dash", dest="dash", action="store_false")
@@ -296,7 +462,8 @@ def main():
     ap.add_argument("--srt")
     ap.add_argument("--ffmpeg-bin")
     ap.add_argument("--ar-mode", choices=["source", "fixed"], default="source")
-    ap.set_defaults(hls=True, dash=True, encrypt_hls=False)
+    # gpu=None -> auto-detect NVENC dari `ffmpeg -encoders`
+    ap.set_defaults(hls=True, dash=True, encrypt_hls=False, gpu=None)
     args = ap.parse_args()
 
     inp = Path(args.input).resolve()
@@ -346,228 +513,212 @@ def main():
             print(f"[subs] extract_embedded failed: {e}", flush=True)
 
     # targets berdasar AR sumber (default)
-    src_w, src_h = probe_src_wh(ffprobe, inp)
-    dar_str = probe_dar(ffprobe, inp)
+    info = probe_all(ffprobe, inp)
+    src_w, src_h, dar_str = info["w"], info["h"], info["dar"]
     renditions = [r.strip() for r in args.renditions.split(",") if r.strip()]
     targets = build_targets(renditions, mode=args.ar_mode, src_w=src_w, src_h=src_h)
     if not targets:
         print("ERROR: no valid renditions", file=sys.stderr)
         sys.exit(3)
 
-    # codec
+    # codec (NVENC bila tersedia, kecuali --no-gpu)
+    gpu = has_nvenc(ffmpeg, args.codec) if args.gpu is None else args.gpu
     if args.codec == "h264":
-        vcodec = "h264_nvenc" if args.gpu else "libx264"
+        vcodec = "h264_nvenc" if gpu else "libx264"
     else:
-        vcodec = "hevc_nvenc" if args.gpu else "libx265"
+        vcodec = "hevc_nvenc" if gpu else "libx265"
+    on_gpu = vcodec.endswith("_nvenc")
+    preset = args.nvenc_preset if on_gpu else "medium"
+    hwdec = on_gpu and not args.no_hwaccel and nvdec_ok(info)
+    if on_gpu and not args.no_hwaccel and not hwdec:
+        print(
+            f"[encode] NVDEC tidak mendukung {info['codec']}/{info['pix_fmt']}"
+            " -> decode + scale CPU",
+            flush=True,
+        )
+    pix_fmt = "nv12" if on_gpu else "yuv420p"
+    threads = args.threads or os.cpu_count() or 0
+    # satu proses encode semua rendition: bagi core ke tiap encoder CPU supaya
+    # total thread x264/x265 tidak N kali jumlah core
+    enc_threads = max(1, threads // len(targets)) if threads else 0
+    print(f"[encode] vcodec={vcodec} preset={preset}", flush=True)
 
     sources = {}
-    duration_ms = 0
+    duration_ms = info["duration_ms"]
+
+    # ================= PyNvCodec (opsional) =================
+    # Video ladder via NVDEC/NVENC langsung; ffmpeg cuma audio + packaging (-c copy)
+    es_inputs, es_amap = None, []
+    es_dir = workdir / "_pynvc"
+    skip = None
+    if args.engine == "pynvc":
+        # ES mentah tanpa PTS sumber: frame rate remux harus sama persis dengan
+        # encoder, jadi VFR (atau fps tak diketahui) selalu lewat ffmpeg
+        if not pynvc_available():
+            skip = "PyNvCodec tidak tersedia"
+        elif info["vfr"] or not info["fps"]:
+            skip = f"sumber VFR/fps tidak diketahui ({info['fps'] or '?'})"
+        if skip:
+            print(f"[pynvc] fallback ke ffmpeg: {skip}", flush=True)
+    if args.engine == "pynvc" and not skip:
+        try:
+            es_paths = encode_ladder_pynvc(
+                str(inp),
+                targets,
+                str(es_dir),
+                fps=info["fps"],
+                codec=args.codec,
+                preset=args.nvenc_preset,
+            )
+            es_inputs = []
+            for p in es_paths:
+                es_inputs += ["-framerate", info["fps"], "-i", p]
+            audio = es_dir / "audio.m4a"
+            try:
+                run(
+                    [ffmpeg, "-hide_banner", "-y", "-i", str(inp), "-vn"]
+                    + ["-c:a", "aac", "-b:a", "128k", "-ac", "2", str(audio)]
+                )
+                es_inputs += ["-i", str(audio)]
+                es_amap = ["-map", f"{len(es_paths)}:a:0"]
+            except Exception:
+                es_amap = []
+            print(f"[pynvc] ladder done ({len(es_paths)} stream)", flush=True)
+        except Exception as e:
+            print(f"[pynvc] fallback ke ffmpeg: {e}", flush=True)
+            es_inputs = None
+
+    # HLS & DASH: satu kali decode/scale/encode, hasil encode dibagi ke
+    # beberapa muxer lewat tee (slave HLS per rendition + satu slave DASH)
+    n = len(targets)
+
+    def video_cmd(hwdec: bool) -> list[str]:
+        if es_inputs:
+            cmd = [ffmpeg, "-hide_banner", "-y", *es_inputs]
+            for i in range(n):
+                cmd += ["-map", f"{i}:v:0"]
+            cmd += [*es_amap, "-c", "copy"]
+        else:
+            fc, out_labels = build_filter_complex_for_targets(
+                targets, gpu=hwdec, pix_fmt=pix_fmt
+            )
+            cmd = [ffmpeg, "-hide_banner", "-y"]
+            if hwdec:
+                cmd += hwaccel_args(vcodec)
+            elif threads:
+                cmd += ["-filter_complex_threads", str(threads)]
+            cmd += ["-i", str(inp), "-filter_complex", fc]
+            for lab in out_labels:
+                cmd += ["-map", f"[{lab}]"]
+            cmd += ["-map", "a:0?"]
+            for i, (_w, _h, br, _n) in enumerate(targets):
+                add_stream_opts_one(
+                    cmd,
+                    i,
+                    vcodec,
+                    br,
+                    preset,
+                    pix_fmt if on_gpu and not hwdec else None,
+                    enc_threads,
+                )
+            cmd += ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+        # TS (HLS) & fMP4 (DASH) dari encoder yang sama -> extradata global
+        return cmd + ["-aspect", dar_str, "-flags", "+global_header"]
+
+    slaves = []
 
     # ================= HLS =================
     if args.hls:
-        print("[hls] start", flush=True)
         hls_dir = workdir / "HLS"
         ensure_dir(hls_dir)
         for _w, h, _br, _n in targets:
             ensure_dir(hls_dir / f"{h}")
 
-        fc, out_labels = build_filter_complex_for_targets(targets)
-        cmd = [ffmpeg, "-hide_banner", "-y", "-i", str(inp), "-filter_complex", fc]
-
-        key_path, key_iv = (None, None)
+        key_info = None
         if args.encrypt_hls:
+            # key + IV sama untuk semua rendition -> satu key_info.txt
+            # (URI relatif dari HLS/{h}/index.m3u8)
             key_path = hls_dir / "enc.key"
             key_path.write_bytes(os.urandom(16))
-            key_iv = os.urandom(16).hex()
-
-        for i, lab in enumerate(out_labels):
-            w, h, br, name = targets[i]
-            cmd += ["-map", f"[{lab}]", "-map", "a:0?"]
-            add_stream_opts_one(cmd, vcodec, br)
-            cmd += ["-aspect", dar_str]
-            cmd += [
-                "-f",
-                "hls",
-                "-hls_time",
-                "4",
-                "-hls_playlist_type",
-                "vod",
-                "-hls_flags",
-                "independent_segments",
-            ]
-            if args.encrypt_hls:
-                ki = hls_dir / f"_key_{h}.txt"
-                ki.write_text(
-                    "../enc.key\n" + str(key_path) + "\n" + key_iv + "\n",
-                    encoding="utf-8",
-                )
-                cmd += ["-hls_key_info_file", str(ki)]
-            cmd += [
-                "-hls_segment_filename",
-                str(hls_dir / f"{h}" / "seg_%05d.ts"),
-                str(hls_dir / f"{h}" / "index.m3u8"),
-            ]
+            key_info = hls_dir / "key_info.txt"
+            key_info.write_text(
+                "../enc.key\n" + str(key_path) + "\n" + os.urandom(16).hex() + "\n",
+                encoding="utf-8",
+            )
 
-        run(cmd)
-        write_hls_master(hls_dir, base, targets)
-        sources["hls"] = f"HLS/{base}.m3u8"
-        print("[hls] done", flush=True)
+        for i, (w, h, br, name) in enumerate(targets):
+            opts = {
+                "f": "hls",
+                "select": f"v:{i},a",
+                "hls_time": "4",
+                "hls_playlist_type": "vod",
+                "hls_flags": "independent_segments",
+            }
+            if key_info:
+                opts["hls_key_info_file"] = str(key_info)
+            opts["hls_segment_filename"] = str(hls_dir / f"{h}" / "seg_%05d.ts")
+            slaves.append(tee_slave(opts, str(hls_dir / f"{h}" / "index.m3u8")))
 
     # ================= DASH =================
     if args.dash:
-        print("[dash] start", flush=True)
         dash_dir = workdir / "DASH"
         ensure_dir(dash_dir)
 
-        # Pre-create folder numerik untuk semua rep (v,a,v,a,...)
-        total_reps = len(targets) * 2
-        for i in range(total_reps):
+        # Folder segmen = $RepresentationID$ (0..n-1 video, n audio); folder
+        # video di-rename ke tinggi rendition setelah encode (dash_height_layout)
+        for i in range(n + 1):
             ensure_dir(dash_dir / str(i))
 
-        fc, out_labels = build_filter_complex_for_targets(targets)
-        cmd = [ffmpeg, "-hide_banner", "-y", "-i", str(inp), "-filter_complex", fc]
-
-        # Map & codec per-rep ke satu output DASH
-        for i, lab in enumerate(out_labels):
-            br = targets[i][2]
-            cmd += ["-map", f"[{lab}]", "-map", "a:0?"]
-            maxr = int(br * 1.07)
-            buf = maxr * 2
-            cmd += [
-                f"-c:v:{i}",
-                vcodec,
-                f"-b:v:{i}",
-                str(br),
-                f"-maxrate:v:{i}",
-                str(maxr),
-                f"-bufsize:v:{i}",
-                str(buf),
-                f"-g:v:{i}",
-                "48",
-                "-keyint_min",
-                "48",
-                f"-sc_threshold:v:{i}",
-                "0",
-                f"-preset:v:{i}",
-                "medium",
-                f"-aspect:v:{i}",
-                dar_str,
-                f"-c:a:{i}",
-                "aac",
-                f"-b:a:{i}",
-                "128k",
-                f"-ac:a:{i}",
-                "2",
-            ]
-
         mpd_name = f"{base}.mpd"
-        cmd += [
-            "-f",
-            "dash",
-            "-use_timeline",
-            "1",
-            "-use_template",
-            "1",
-            "-seg_duration",
-            "4",
-            "-adaptation_sets",
-            "id=0,streams=v id=1,streams=a",
-            "-init_seg_name",
-            "$RepresentationID$/init.m4s",
-            "-media_seg_name",
-            "$RepresentationID$/chunk_$Number%05d$.m4s",
-            mpd_name,
-        ]
+        opts = {
+            "f": "dash",
+            "use_timeline": "1",
+            "use_template": "1",
+            "seg_duration": "4",
+            "adaptation_sets": "id=0,streams=v id=1,streams=a",
+            "init_seg_name": "$RepresentationID$/init.m4s",
+            "media_seg_name": "$RepresentationID$/chunk_$Number%05d$.m4s",
+        }
+        slaves.append(tee_slave(opts, str(dash_dir / mpd_name)))
+
+    # ================= Encode =================
+    if slaves:
+        print("[encode] start", flush=True)
+        tee = ["-f", "tee", "|".join(slaves)]
+        progress = {"total_ms": duration_ms, "base": base, "label": "encode"}
+        try:
+            run(video_cmd(hwdec) + tee, progress=progress)
+        except RuntimeError:
+            if not hwdec or es_inputs:
+                raise
+            # NVDEC menolak stream di tengah jalan (profil/level, frame software
+            # masuk graph CUDA): ulang sekali dengan decode + scale CPU -> NVENC
+            print("[encode] NVDEC gagal -> ulang dengan decode CPU", flush=True)
+            run(video_cmd(False) + tee, progress=progress)
+
+    if args.hls:
+        write_hls_master(hls_dir, base, targets)
+        sources["hls"] = f"HLS/{base}.m3u8"
+        print("[hls] done", flush=True)
 
-        run(cmd, cwd=dash_dir)
-        mpd_path = dash_dir / mpd_name
+    if args.dash:
         try:
-            tree = ET.parse(mpd_path)
-            root = tree.getroot()
-            ns = ""
-            if root.tag.startswith("{"):
-                ns = root.tag.split("}")[0].strip("{")
-
-            def q(tag):
-                return f"{{{ns}}}{tag}" if ns else tag
-
-            video_as = None
-            for a in root.findall(".//" + q("AdaptationSet")):
-                ctype = (a.get("contentType") or "") + " " + (a.get("mimeType") or "")
-                if "video" in ctype:
-                    video_as = a
-                    break
-            if video_as is None:
-                video_as = root.find(".//" + q("AdaptationSet"))
-
-            mapping = []
-            reps = (
-                list(video_as.findall(q("Representation")))
-                if video_as is not None
-                else []
-            )
-            # Petakan urutan height target terbesar->kecil ke id numerik
-            heights_sorted = [str(t[1]) for t in targets]
-            for idx, rep in enumerate(reps):
-                rid = rep.get("id") or str(idx * 2)
-                h = rep.get("height") or (
-                    heights_sorted[idx] if idx < len(heights_sorted) else ""
-                )
-                if rid and h:
-                    mapping.append((rid, h))
-                    rep.set("id", str(h))
-                    w = next((t[0] for t in targets if str(t[1]) == str(h)), "")
-                    if w:
-                        rep.set("width", str(w))
-                        rep.set("height", str(h))
-
-            tree.write(mpd_path, encoding="utf-8", xml_declaration=True)
-            for rid, h in mapping:
-                src = dash_dir / rid
-                dst = dash_dir / str(h)
-                if src.exists() and src.is_dir():
-                    if dst.exists():
-                        for rootdir, _dirs, files in os.walk(src):
-                            rel = Path(rootdir).relative_to(src)
-                            (dst / rel).mkdir(parents=True, exist_ok=True)
-                            for f in files:
-                                os.replace(
-                                    os.path.join(rootdir, f), str((dst / rel) / f)
-                                )
-                        shutil.rmtree(src, ignore_errors=True)
-                    else:
-                        os.replace(src, dst)
+            dash_height_layout(dash_dir, mpd_name, targets)
         except Exception as e:
             print(f"[dash] mpd rewrite warn: {e}", flush=True)
-
         sources["dash"] = f"DASH/{base}.mpd"
         print("[dash] done", flush=True)
 
-    # durasi
-    try:
-        out = subprocess.check_output(
-            [
-                which_ffprobe(ffmpeg),
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                str(inp),
-            ],
-            text=True,
-        ).strip()
-        duration_ms = ms(float(out))
-    except Exception:
-        duration_ms = 0
+    if es_inputs:
+        shutil.rmtree(es_dir, ignore_errors=True)
 
     # job.json
     jobj = {
         "input": str(inp),
         "outdir": str(out_root),
         "codec": args.codec,
-        "gpu": bool(args.gpu),
+        "gpu": on_gpu,
+        "engine": "pynvc" if es_inputs else "ffmpeg",
         "renditions": [f"{t[1]}p" for t in targets],
         "hls": bool(args.hls),
         "dash": bool(args.dash),
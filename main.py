@@ -1,8 +1,9 @@
 # gui.py
 import sys, os, subprocess, threading, queue, socket, ctypes, html, json, sqlite3, time
+import asyncio, codecs, concurrent.futures, re
 from pathlib import Path
-from statistics import mean
 from datetime import datetime
+from functools import lru_cache
 
 from PySide6.QtWidgets import (
     QApplication,
@@ -16,6 +17,7 @@ from PySide6.QtWidgets import (
     QComboBox,
     QLineEdit,
     QTextEdit,
+    QPlainTextEdit,
     QMessageBox,
     QProgressBar,
     QSystemTrayIcon,
@@ -26,8 +28,8 @@ from PySide6.QtWidgets import (
     QTabWidget,
     QToolButton,
 )
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QTextCursor, QIcon
+from PySide6.QtCore import Qt, QThread, QThreadPool, QTimer, QUrl, Signal
+from PySide6.QtGui import QDesktopServices, QIcon
 
 # Optional: Windows native toast
 try:
@@ -35,6 +37,27 @@ try:
 except Exception:
     Notification = None
 
+# Optional: event filesystem native untuk Watcher (fallback: rescan folder)
+try:
+    from watchdog.observers import Observer
+    from watchdog.observers.polling import PollingObserver
+    from watchdog.events import FileSystemEventHandler
+except Exception:
+    Observer = PollingObserver = None
+    FileSystemEventHandler = object
+
+# Optional: deteksi share jaringan (NFS/SMB) untuk Watcher
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+# Optional: parser JSON cepat untuk player.json
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 CREATE_NO_WINDOW = 0x08000000
 STARTF_USESHOWWINDOW = 0x00000001
 SW_HIDE = 0
@@ -59,6 +82,10 @@ def popen_hidden(args, cwd=None):
 
 
 APP_NAME = "StreamCode"
+LOG_MAX_LINES = 5000
+LOG_QUEUE_MAX = 50000
+HIST_PAGE = 500
+VIDEO_EXTS = frozenset({".mp4", ".mkv", ".mov", ".m4v"})
 
 # =====(cx_Freeze Config) =====
 FROZEN = bool(getattr(sys, "frozen", False))
@@ -69,6 +96,7 @@ APPDATA_DIR = Path(os.environ.get("LOCALAPPDATA", EXE_DIR)) / "StreamCode"
 LOG_DIR = APPDATA_DIR / "logs"
 TMP_DIR = APPDATA_DIR / "tmp"
 HISTORY_DB = APPDATA_DIR / "history.db"
+SERVER_LOG = LOG_DIR / "server.log"
 for d in (APPDATA_DIR, LOG_DIR, TMP_DIR):
     d.mkdir(parents=True, exist_ok=True)
 
@@ -110,6 +138,108 @@ def _child_cmd(script: str) -> list[str]:
     return [sys.executable, str((Path(__file__).parent / script).resolve())]
 
 
+def subdir_names(path: str) -> set[str]:
+    """
+    Nama subfolder langsung di path (normcase), dari satu pass os.scandir.
+    """
+    try:
+        with os.scandir(path) as it:
+            return {os.path.normcase(e.name) for e in it if e.is_dir()}
+    except OSError:
+        return set()
+
+
+@lru_cache(maxsize=256)
+def _load_player_meta(path: str, mtime_ns: int) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def load_player_meta(path: str) -> dict:
+    """
+    player.json terparse, di-cache per (path, mtime) -> klik/seleksi berulang
+    tidak membaca ulang file. Hasil dipakai bersama: jangan dimutasi.
+    """
+    return _load_player_meta(path, os.stat(path).st_mtime_ns)
+
+
+def _entry_names(path: str) -> tuple[set[str], set[str]]:
+    # (nama file, nama folder) langsung di path (normcase), satu os.scandir
+    files, dirs = set(), set()
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                (dirs if e.is_dir() else files).add(os.path.normcase(e.name))
+    except OSError:
+        pass
+    return files, dirs
+
+
+def fallback_sources(
+    job_dir: str, base: str, hls: bool = True, dash: bool = True
+) -> tuple[str | None, str | None, str | None, str | None]:
+    """
+    Cari HLS/DASH/VTT/thumbs tanpa player.json: satu scandir job_dir, plus satu
+    per subfolder HLS/DASH yang memang ada (bukan stat per kandidat file).
+    """
+    nc = os.path.normcase
+    files, dirs = _entry_names(job_dir)
+    hls_rel = dash_rel = vtt_rel = thumbs_rel = None
+    if hls and nc("HLS") in dirs:
+        if nc(f"{base}.m3u8") in _entry_names(os.path.join(job_dir, "HLS"))[0]:
+            hls_rel = f"HLS/{base}.m3u8"
+    if dash and nc("DASH") in dirs:
+        if nc(f"{base}.mpd") in _entry_names(os.path.join(job_dir, "DASH"))[0]:
+            dash_rel = f"DASH/{base}.mpd"
+    if nc(f"{base}.vtt") in files:
+        vtt_rel = f"{base}.vtt"
+    if nc("thumbs.vtt") in files:
+        thumbs_rel = "thumbs.vtt"
+    return hls_rel, dash_rel, vtt_rel, thumbs_rel
+
+
+def _scan_size(path: str) -> tuple[int, list[str]]:
+    # ukuran file langsung di path + daftar subfolder (tanpa ikut symlink)
+    total, subdirs = 0, []
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(e.path)
+                    else:
+                        total += e.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return total, subdirs
+
+
+def folder_size(path: str, workers: int = 8) -> int:
+    """
+    Total ukuran file di bawah path. Subfolder (rendition HLS/DASH) di-scan
+    paralel supaya latensi stat per inode (disk/share jaringan) saling tumpang.
+    """
+    total, subdirs = _scan_size(path)
+    if not subdirs:
+        return total
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(workers, len(subdirs))
+    ) as ex:
+        pending = {ex.submit(_scan_size, d) for d in subdirs}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for fut in done:
+                size, subs = fut.result()
+                total += size
+                pending |= {ex.submit(_scan_size, d) for d in subs}
+    return total
+
+
 def sizeof_fmt(num: int) -> str:
     for unit in ["B", "KB", "MB", "GB", "TB"]:
         if num < 1024.0:
@@ -136,105 +266,457 @@ Catatan: HLS HEVC tidak didukung di Chrome; player otomatis fallback ke DASH. Un
 """
 
 
-class ProcessReader(threading.Thread):
-    def __init__(
-        self,
-        base: str,
-        popen: subprocess.Popen,
-        out_queue: "queue.Queue[tuple[str,str]]",
-    ):
-        super().__init__(daemon=True)
-        self.base = base
-        self.p = popen
+class ChildProc:
+    """
+    Handle gaya Popen (poll/terminate/kill/wait) untuk proses milik ChildRunner.
+    """
+
+    def __init__(self, proc, loop, done):
+        self.proc = proc
+        self.loop = loop
+        self.done = done  # concurrent Future: selesai saat stdout EOF + exit
+        self.pid = proc.pid
+
+    def poll(self) -> int | None:
+        return self.proc.returncode
+
+    def _signal(self, fn):
+        def call():
+            try:
+                fn()
+            except ProcessLookupError:
+                pass
+
+        self.loop.call_soon_threadsafe(call)
+
+    def terminate(self):
+        self._signal(self.proc.terminate)
+
+    def kill(self):
+        self._signal(self.proc.kill)
+
+    def wait(self, timeout: float | None = None) -> int:
+        try:
+            return self.done.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+
+
+# prefix baris key=value dari `ffmpeg -progress` / stats; dibuang di ChildRunner
+NOISE_PREFIXES = (
+    "out_time_ms=",
+    "out_time_us=",
+    "progress=",
+    "frame=",
+    "fps=",
+    "bitrate=",
+    "total_size=",
+    "speed=",
+)
+
+
+class ChildRunner:
+    """
+    Satu thread event loop asyncio untuk semua child (encode/server): stdout
+    dibaca lewat readiness OS, bukan satu thread blocking readline per proses.
+    Tiap chunk stdout -> satu queue.put((base, [baris])); jeda FLUSH_INTERVAL
+    setelah tiap put membiarkan baris menumpuk, jadi maks ~20 put/detik/proses.
+    Queue penuh -> pembacaan ditunda (backpressure), baris tidak dibuang.
+    """
+
+    READ_SIZE = 64 * 1024
+    FLUSH_INTERVAL = 0.05
+
+    def __init__(self, out_queue: "queue.Queue[tuple[str,list[str]]]"):
         self.q = out_queue
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="child-io", daemon=True
+        )
+        self._thread.start()
+
+    def spawn(
+        self, base: str, args: list[str], log_path: Path | None = None, **kw
+    ) -> ChildProc:
+        """
+        log_path: stdout+stderr child langsung ke file (tanpa pipe/log_queue),
+        jadi child tidak pernah tertahan menunggu pembaca.
+        """
+        out = open(log_path, "wb", buffering=0) if log_path else subprocess.PIPE
+        try:
+            fut = asyncio.run_coroutine_threadsafe(
+                asyncio.create_subprocess_exec(
+                    *args, stdout=out, stderr=subprocess.STDOUT, **kw
+                ),
+                self.loop,
+            )
+            proc = fut.result()
+        finally:
+            if log_path:
+                out.close()  # child sudah memegang fd-nya sendiri
+        coro = proc.wait() if log_path else self._read(base, proc)
+        done = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return ChildProc(proc, self.loop, done)
+
+    async def _put(self, item: tuple[str, list[str]]):
+        # queue penuh: tunda baca (child tertahan di pipe), jangan blok loop
+        while True:
+            try:
+                self.q.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(self.FLUSH_INTERVAL)
+
+    async def _read(self, base: str, proc) -> int:
+        dec = codecs.getincrementaldecoder("utf-8")("replace")
+        tail = ""
+        while True:
+            chunk = await proc.stdout.read(self.READ_SIZE)
+            text = tail + dec.decode(chunk, final=not chunk)
+            if not chunk:
+                if text.strip():
+                    await self._put((base, [text.rstrip()]))
+                break
+            lines = text.split("\n")
+            tail = lines.pop()
+            # baris -progress/stats mentah ffmpeg tidak pernah ditampilkan
+            lines = [ln.rstrip() for ln in lines if not ln.startswith(NOISE_PREFIXES)]
+            if lines:
+                await self._put((base, lines))
+                await asyncio.sleep(self.FLUSH_INTERVAL)
+        return await proc.wait()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2.0)
+
+
+def format_log_html(level: str, text: str) -> str:
+    ts = datetime.now().strftime("%H:%M:%S")
+    safe = html.escape(text)
+    color = {
+        "INFO": "#cfd3dc",
+        "WARN": "#ffcc66",
+        "ERROR": "#ff6b6b",
+        "DONE": "#8fd18f",
+    }.get(level, "#cfd3dc")
+    return f'<span style="color:#8088a2">{ts}</span> <span style="color:{color}">{safe}</span>'
+
+
+# "PROGRESS base=.. rend=.. pct=.." dari encode.py; base boleh berisi spasi
+PROGRESS_RE = re.compile(r"PROGRESS base=(.+) rend=(\S+) pct=(\d+(?:\.\d+)?)$")
+
+
+def log_level(line: str) -> str:
+    lower = line.lower()
+    if "error" in lower or "failed" in lower or "traceback" in lower:
+        return "ERROR"
+    if line.startswith("[encode] cancel"):
+        return "WARN"
+    return "INFO"
+
+
+class LogDispatcher(QThread):
+    """
+    Konsumen log_queue di luar GUI thread: get() blocking lalu drain sampai BATCH
+    item, parse PROGRESS/JOB_DONE dan render HTML di sini; GUI menerima satu
+    list HTML per batch lewat signal (queued). PROGRESS per base digabung dan
+    di-emit maks tiap PROGRESS_INTERVAL, jadi burst baris ffmpeg tidak membanjiri GUI.
+    """
+
+    htmlReady = Signal(list)  # [html baris log]
+    progressUpdated = Signal(str, str, float)  # base, rend, pct
+    jobDone = Signal(str)  # base
+
+    BATCH = 256
+    PROGRESS_INTERVAL = 0.1
+    IDLE_TIMEOUT = 0.25
+
+    def __init__(self, in_queue: "queue.Queue[tuple[str,list[str]]]"):
+        super().__init__()
+        self.q = in_queue
+        self._pending: dict[str, dict[str, float]] = {}  # base -> {rend: pct}
+        self._last_emit: dict[str, float] = {}
+        self._html: list[str] = []
+
+    def _flush_html(self):
+        if self._html:
+            self.htmlReady.emit(self._html)
+            self._html = []
+
+    def _flush_progress(self, base: str):
+        for rend, pct in self._pending.pop(base, {}).items():
+            self.progressUpdated.emit(base, rend, pct)
+        self._last_emit[base] = time.monotonic()
+
+    def _flush_due(self, force: bool = False):
+        now = time.monotonic()
+        for base in list(self._pending):
+            if force or now - self._last_emit.get(base, 0.0) >= self.PROGRESS_INTERVAL:
+                self._flush_progress(base)
+
+    def _handle(self, base: str, line: str):
+        if line.startswith("PROGRESS "):
+            m = PROGRESS_RE.match(line)
+            if m:
+                b, r, pct = m.groups()
+                self._pending.setdefault(b, {})[r] = float(pct)
+        elif "JOB_DONE base=" in line:
+            b = line.split("JOB_DONE base=", 1)[1].strip()
+            self._flush_html()
+            self._flush_progress(b)
+            self._last_emit.pop(b, None)
+            self.jobDone.emit(b)
+        else:
+            self._html.append(format_log_html(log_level(line), line))
 
     def run(self):
-        for line in iter(self.p.stdout.readline, ""):
-            if not line:
-                break
-            self.q.put((self.base, line.rstrip()))
-        try:
-            self.p.stdout.close()
-        except Exception:
-            pass
+        while not self.isInterruptionRequested():
+            timeout = self.PROGRESS_INTERVAL if self._pending else self.IDLE_TIMEOUT
+            try:
+                items = [self.q.get(timeout=timeout)]
+            except queue.Empty:
+                self._flush_due(force=True)
+                continue
+            while len(items) < self.BATCH:
+                try:
+                    items.append(self.q.get_nowait())
+                except queue.Empty:
+                    break
+            for base, lines in items:
+                for line in lines:
+                    self._handle(base, line)
+            self._flush_html()
+            self._flush_due()
+
+
+NETWORK_FS = {"nfs", "nfs4", "cifs", "smbfs", "smb2", "smb3", "9p", "fuse.sshfs"}
+
+
+def is_network_path(path: str) -> bool:
+    """
+    Share NFS/SMB tidak mengirim event native (inotify/ReadDirectoryChangesW)
+    untuk perubahan dari host lain -> watcher harus polling.
+    """
+    p = os.path.normcase(os.path.abspath(path))
+    if p.startswith(("\\\\", "//")):
+        return True
+    if psutil is None:
+        return False
+    best = None
+    try:
+        for part in psutil.disk_partitions(all=True):
+            mp = os.path.normcase(part.mountpoint)
+            if p == mp or p.startswith(mp.rstrip("\\/") + os.sep):
+                if best is None or len(mp) > len(best.mountpoint):
+                    best = part
+    except Exception:
+        return False
+    if best is None:
+        return False
+    return best.fstype.lower() in NETWORK_FS or "remote" in best.opts
+
+
+class _WatchHandler(FileSystemEventHandler):
+    """
+    Event watchdog -> path file ke queue; cek stabil dilakukan WatcherThread.
+    """
+
+    def __init__(self, out_queue: "queue.Queue[str]"):
+        super().__init__()
+        self.q = out_queue
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.q.put(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.q.put(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.q.put(event.dest_path)
 
 
 class WatcherThread(threading.Thread):
-    VIDEO_EXTS = {".mp4", ".mkv", ".mov", ".m4v"}
+    VIDEO_EXTS = VIDEO_EXTS
 
     def __init__(
         self,
         gui_ref,
         in_dir: str,
         opts: dict,
-        interval: float = 2.0,
-        stable_hits: int = 3,
+        debounce: float = 0.3,
+        poll_timeout: float = 60.0,
     ):
         super().__init__(daemon=True)
         self.gui = gui_ref
         self.in_dir = in_dir
         self.opts = opts
-        self.interval = interval
-        self.stable_hits = stable_hits
-        self._stop = threading.Event()
-        self._seen = {}
+        # jendela hening setelah event terakhir sebelum file dicek & di-enqueue
+        self.debounce = debounce
+        self.poll_timeout = poll_timeout
+        self._stop_ev = threading.Event()
+        self._events: "queue.Queue[str]" = queue.Queue()
+        # path -> (size, mtime_ns) dari event terakhir
+        self._pending: dict[str, tuple[int, int]] = {}
         self._processed = set()
 
     def stop(self):
-        self._stop.set()
+        self._stop_ev.set()
 
-    def run(self):
-        self.gui._log_line("INFO", f"[watcher] start → {self.in_dir}")
-        while not self._stop.is_set():
-            try:
-                if not os.path.isdir(self.in_dir):
-                    time.sleep(self.interval)
-                    continue
-                for name in os.listdir(self.in_dir):
-                    path = os.path.join(self.in_dir, name)
-                    ext = os.path.splitext(name)[1].lower()
-                    if ext not in self.VIDEO_EXTS:
-                        continue
-                    if path in self._processed:
+    def _start_observer(self):
+        if Observer is None:
+            return None
+        if is_network_path(self.in_dir):
+            obs = PollingObserver(timeout=self.poll_timeout)
+            mode = f"polling {self.poll_timeout:g}s (network share)"
+        else:
+            obs = Observer()
+            mode = "native events"
+        obs.schedule(_WatchHandler(self._events), self.in_dir, recursive=False)
+        obs.start()
+        self.gui.watcherLog.emit("INFO", f"[watcher] mode → {mode}")
+        return obs
+
+    def _scan(self) -> int:
+        """
+        Rescan folder (saat start & mode tanpa watchdog). DirEntry sudah membawa
+        nama/path/stat (Windows: tanpa syscall tambahan), jadi tidak lewat queue.
+        """
+        n = 0
+        exts = self.VIDEO_EXTS
+        processed = self._processed
+        try:
+            with os.scandir(self.in_dir) as it:
+                for e in it:
+                    if e.path in processed:
                         continue
-                    base = os.path.splitext(name)[0]
-                    out_dir = os.path.join(self.opts["out_root"], base)
-                    if os.path.isdir(out_dir):
-                        self._processed.add(path)
+                    stem, ext = os.path.splitext(e.name)
+                    if ext.lower() not in exts or not e.is_file():
                         continue
                     try:
-                        sz = os.path.getsize(path)
-                    except Exception:
+                        st = e.stat()
+                    except OSError:
                         continue
-                    rec = self._seen.get(path, {"size": -1, "hits": 0})
-                    if sz == rec["size"]:
-                        rec["hits"] += 1
-                    else:
-                        rec = {"size": sz, "hits": 1}
-                    self._seen[path] = rec
-                    if rec["hits"] >= self.stable_hits:
-                        self._processed.add(path)
-                        self.gui._log_line("INFO", f"[watcher] enqueue → {name}")
-                        self.gui._start_job_for_path(
-                            path,
-                            codec=self.opts["codec"],
-                            gpu=self.opts["gpu"],
-                            renditions=self.opts["renditions"],
-                            do_hls=self.opts["hls"],
-                            do_dash=self.opts["dash"],
-                            encrypt=self.opts["encrypt"],
-                            extract_subs=self.opts["extract_subs"],
-                            srt_path=None,
-                        )
-                time.sleep(self.interval)
+                    n += self._note(e.path, stem, (st.st_size, st.st_mtime_ns))
+        except OSError:
+            pass
+        return n
+
+    @staticmethod
+    def _stat(path: str) -> tuple[int, int] | None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _track(self, path: str) -> bool:
+        """
+        True bila event menyentuh video yang sedang ditunggu (geser debounce).
+        """
+        if path in self._processed:
+            return False
+        stem, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() not in self.VIDEO_EXTS:
+            return False
+        st = self._stat(path)
+        if st is None:
+            # dihapus/di-rename sebelum selesai
+            self._pending.pop(path, None)
+            return False
+        return self._note(path, stem, st)
+
+    def _note(self, path: str, stem: str, st: tuple[int, int]) -> bool:
+        if path not in self._pending and os.path.isdir(
+            os.path.join(self.opts["out_root"], stem)
+        ):
+            self._processed.add(path)
+            return False
+        self._pending[path] = st
+        return True
+
+    def _drain(self, timeout: float) -> int:
+        n = 0
+        try:
+            n += self._track(self._events.get(timeout=timeout))
+            while True:
+                n += self._track(self._events.get_nowait())
+        except queue.Empty:
+            pass
+        return n
+
+    def _flush(self):
+        """
+        Enqueue file yang size & mtime-nya tidak berubah selama jendela debounce;
+        yang masih berubah tetap pending untuk jendela berikutnya.
+        """
+        for path, last in list(self._pending.items()):
+            st = self._stat(path)
+            if st is None:
+                del self._pending[path]
+                continue
+            if st != last:
+                self._pending[path] = st
+                continue
+            del self._pending[path]
+            self._processed.add(path)
+            self.gui.watcherLog.emit(
+                "INFO", f"[watcher] enqueue → {os.path.basename(path)}"
+            )
+            # thread ini tanpa event loop Qt: start job (tabel, QTimer) di GUI thread
+            self.gui.watcherEnqueue.emit(path, self.opts)
+
+    def run(self):
+        self.gui.watcherLog.emit("INFO", f"[watcher] start → {self.in_dir}")
+        try:
+            observer = self._start_observer()
+        except Exception as e:
+            self.gui.watcherLog.emit("ERROR", f"[watcher] {e}")
+            observer = None
+        if observer is None:
+            self.gui.watcherLog.emit(
+                "INFO", "[watcher] mode → rescan (watchdog tidak ada)"
+            )
+        # file yang sudah ada sebelum watcher start
+        deadline = time.monotonic() + self.debounce if self._scan() else None
+        last_scan = time.monotonic()
+        while not self._stop_ev.is_set():
+            try:
+                # idle: tidur sampai ada event; burst event menggeser deadline
+                # sehingga satu salinan file besar = satu flush
+                now = time.monotonic()
+                timeout = 1.0 if deadline is None else max(0.0, deadline - now)
+                if self._drain(timeout):
+                    deadline = time.monotonic() + self.debounce
+                elif deadline is not None and time.monotonic() >= deadline:
+                    self._flush()
+                    deadline = (
+                        time.monotonic() + self.debounce if self._pending else None
+                    )
+                if observer is None and time.monotonic() - last_scan >= 2.0:
+                    if self._scan():
+                        deadline = time.monotonic() + self.debounce
+                    last_scan = time.monotonic()
             except Exception as e:
-                self.gui._log_line("ERROR", f"[watcher] {e}")
-                time.sleep(self.interval)
-        self.gui._log_line("INFO", "[watcher] stopped")
+                self.gui.watcherLog.emit("ERROR", f"[watcher] {e}")
+                self._stop_ev.wait(self.debounce)
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=2.0)
+        self.gui.watcherLog.emit("INFO", "[watcher] stopped")
 
 
 class App(QWidget):
     COL_VIDEO, COL_STATUS, COL_PROGRESS, COL_OUTPUTS, COL_CODEC = range(5)
+    # di-emit worker QThreadPool setelah _history_record_job (queued ke GUI)
+    historyRecorded = Signal()
+    historyFailed = Signal(str)
+    # di-emit WatcherThread (threading.Thread, tanpa event loop Qt)
+    watcherLog = Signal(str, str)  # level, teks
+    watcherEnqueue = Signal(str, dict)  # path, opts watcher
 
     def __init__(self):
         super().__init__()
@@ -251,18 +733,55 @@ class App(QWidget):
                 pass
 
         # server preview
-        self.server_proc: subprocess.Popen | None = None
+        self.server_proc: ChildProc | None = None
         self.server_root_current: str | None = None
         self.app_port = self._find_free_port(8787)
 
         # runtime state
-        self.log_queue: "queue.Queue[tuple[str,str]]" = queue.Queue()
+        self.log_queue: "queue.Queue[tuple[str,list[str]]]" = queue.Queue(
+            maxsize=LOG_QUEUE_MAX
+        )
         self.jobs = {}  # base -> {...}
         self.queue_paths = {}  # base -> input path
+        # counter lblStats, diubah hanya saat status berpindah (_set_status)
+        self._status_of: dict[str, str] = {}
+        self._status_counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
         self.row_of_base: dict[str, int] = {}
+        # kebalikan row_of_base: base per baris tabel (urutan sama dengan tabel)
+        self.base_of_row: list[str] = []
+        # base -> {col: item}; item dibuat sekali, update cukup setText()
+        self.row_items: dict[str, dict[int, QTableWidgetItem]] = {}
+        # base -> {col: text} yang belum ditulis; di-flush maks tiap 100ms
+        self._dirty_rows: dict[str, dict[int, str]] = {}
+        # stdout semua child dibaca di satu thread asyncio -> log_queue
+        self.children = ChildRunner(self.log_queue)
+        # log_queue dikonsumsi LogDispatcher; GUI hanya menerima signal
+        self.log_dispatcher = LogDispatcher(self.log_queue)
+        self.log_dispatcher.htmlReady.connect(
+            self._append_log_html, Qt.QueuedConnection
+        )
+        self.log_dispatcher.progressUpdated.connect(
+            self._on_progress, Qt.QueuedConnection
+        )
+        self.log_dispatcher.jobDone.connect(self._mark_done, Qt.QueuedConnection)
+        self.log_dispatcher.start()
+        # argv dasar child tetap selama sesi (resolve path/exe sekali)
+        self._encode_cmd_base = _child_cmd("encode.py")
+        self._server_cmd_base = _child_cmd("server.py")
 
         # history db (user-writable)
         self.db_path = str(HISTORY_DB)
+        # baris history yang menunggu di-INSERT (dilindungi _db_lock)
+        self._history_pending: list[tuple] = []
+        self._hist_flush_scheduled = False
+        self.historyRecorded.connect(self._schedule_history_flush)
+        self.historyFailed.connect(
+            lambda e: self._log_line("WARN", f"[history] gagal tulis: {e}")
+        )
+        self.watcherLog.connect(self._log_line, Qt.QueuedConnection)
+        self.watcherEnqueue.connect(self._start_watched_job, Qt.QueuedConnection)
+        # (folder job, mtime_ns) -> ukuran; hindari scan ulang untuk base sama
+        self._size_cache: dict[tuple[str, int], int] = {}
         self._init_db()
 
         # watcher
@@ -304,18 +823,16 @@ class App(QWidget):
         self.apply_theme()
         self.setAcceptDrops(True)
 
-        # timers
-        self.timer = QTimer(self)
-        self.timer.setInterval(100)
-        self.timer.timeout.connect(self._pump_logs)
-        self.timer.start()
-        self.stat_timer = QTimer(self)
-        self.stat_timer.setInterval(600)
-        self.stat_timer.timeout.connect(self._refresh_stats)
-        self.stat_timer.start()
-
         # start server on current output folder
-        self.start_server(self.edOut.text().strip())
+        self.start_server(self._outdir)
+
+    def _mirror_text(self, edit: QLineEdit, attr: str):
+        """
+        Salin isi QLineEdit (strip) ke atribut Python setiap kali berubah, supaya
+        jalur panas (enqueue/watcher) tidak bolak-balik membaca widget Qt.
+        """
+        setattr(self, attr, edit.text().strip())
+        edit.textChanged.connect(lambda t: setattr(self, attr, t.strip()))
 
     # ===== Build Tabs =====
     def _build_encoder_tab(self):
@@ -327,6 +844,7 @@ class App(QWidget):
             os.environ.get("ENCODER_OUT_DIR")
             or str(Path.home() / "Documents" / "StreamCode")
         )
+        self._mirror_text(self.edOut, "_outdir")
         self.btnOut = QPushButton("Pilih Output…")
         self.btnOut.clicked.connect(self.pick_outdir)
         self.btnTheme = QPushButton("Tema Gelap/Terang")
@@ -351,8 +869,12 @@ class App(QWidget):
         self.cbCodec = QComboBox()
         self.cbCodec.addItems(["h264", "hevc"])
         self.cbGPU = QCheckBox("GPU Accel (NVENC)")
+        # off -> encode.py --no-hwaccel (decode + scale di CPU, encode NVENC)
+        self.cbHwDec = QCheckBox("Decode GPU (NVDEC)")
+        self.cbHwDec.setChecked(True)
         self.edSrt = QLineEdit()
         self.edSrt.setPlaceholderText("Path SRT (opsional)")
+        self._mirror_text(self.edSrt, "_srt_path")
         self.btnSrt = QPushButton("…")
         self.btnSrt.clicked.connect(self.pick_srt)
 
@@ -379,6 +901,7 @@ class App(QWidget):
         r2.addWidget(QLabel("Codec"))
         r2.addWidget(self.cbCodec)
         r2.addWidget(self.cbGPU)
+        r2.addWidget(self.cbHwDec)
         r2.addWidget(self.edSrt, 2)
         r2.addWidget(self.btnSrt)
         r2.addWidget(QLabel("Resolusi"))
@@ -435,10 +958,12 @@ class App(QWidget):
         self.prog = QProgressBar()
         self.prog.setValue(0)
         v.addWidget(self.prog)
-        self.log = QTextEdit()
+        self.log = QPlainTextEdit()
         self.log.setReadOnly(True)
+        # baris lama dibuang otomatis -> memori & biaya append tetap
+        self.log.setMaximumBlockCount(LOG_MAX_LINES)
         self.log.setStyleSheet(
-            "QTextEdit{font-family: Consolas, 'Courier New', monospace; font-size: 12px}"
+            "QPlainTextEdit{font-family: Consolas, 'Courier New', monospace; font-size: 12px}"
         )
         v.addWidget(self.log, 2)
 
@@ -447,6 +972,7 @@ class App(QWidget):
 
         r1 = QHBoxLayout()
         self.edWatchIn = QLineEdit(str(Path.home() / "Videos"))
+        self._mirror_text(self.edWatchIn, "_watch_in")
         self.btnWatchIn = QPushButton("Pilih Folder…")
         self.btnWatchIn.clicked.connect(self.pick_watch_in)
         self.btnWatchStart = QPushButton("Start Watcher")
@@ -467,6 +993,8 @@ class App(QWidget):
         self.wCodec = QComboBox()
         self.wCodec.addItems(["h264", "hevc"])
         self.wGPU = QCheckBox("GPU Accel (NVENC)")
+        self.wHwDec = QCheckBox("Decode GPU (NVDEC)")
+        self.wHwDec.setChecked(True)
         rlad = QHBoxLayout()
         self.w2160 = QCheckBox("2160")
         self.w1440 = QCheckBox("1440")
@@ -489,6 +1017,7 @@ class App(QWidget):
         r2.addWidget(QLabel("Codec"))
         r2.addWidget(self.wCodec)
         r2.addWidget(self.wGPU)
+        r2.addWidget(self.wHwDec)
         r2.addWidget(QLabel("Resolusi"))
         r2.addLayout(rlad)
         r2.addStretch(1)
@@ -506,6 +1035,12 @@ class App(QWidget):
         top = QHBoxLayout()
         self.edSearch = QLineEdit()
         self.edSearch.setPlaceholderText("Cari (judul/codec/renditions/root)…")
+        # cari otomatis 200ms setelah berhenti mengetik, bukan per ketukan
+        self._hist_search_timer = QTimer(self)
+        self._hist_search_timer.setSingleShot(True)
+        self._hist_search_timer.setInterval(200)
+        self._hist_search_timer.timeout.connect(self._hist_search)
+        self.edSearch.textChanged.connect(lambda _: self._hist_search_timer.start())
         self.btnRefreshHist = QPushButton("Refresh")
         self.btnRefreshHist.clicked.connect(self.load_history)
         self.btnClearMissing = QPushButton("Bersihkan Missing")
@@ -519,6 +1054,11 @@ class App(QWidget):
         v.addLayout(top)
 
         self.tblHist = QTableWidget(0, 9)
+        # id history per baris tabel (urutan sama dengan tabel, id DESC)
+        self._hist_ids: list[int] = []
+        # jumlah baris yang dimuat; bertambah HIST_PAGE saat scroll mentok bawah
+        self._hist_limit = HIST_PAGE
+        self.tblHist.verticalScrollBar().valueChanged.connect(self._hist_on_scroll)
         self.tblHist.setHorizontalHeaderLabels(
             [
                 "Waktu",
@@ -533,6 +1073,8 @@ class App(QWidget):
             ]
         )
         self.tblHist.verticalHeader().setVisible(False)
+        # tinggi baris lewat default header, bukan setRowHeight per baris
+        self.tblHist.verticalHeader().setDefaultSectionSize(28)
         self.tblHist.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.tblHist.setSelectionMode(QAbstractItemView.SingleSelection)
         self.tblHist.setAlternatingRowColors(True)
@@ -571,7 +1113,8 @@ class App(QWidget):
         v.addLayout(bot)
 
         self.load_history()
-        QTimer.singleShot(0, self._history_update_preview_menu)
+        # belum ada seleksi saat build -> cukup set state awal tombol preview
+        self._history_update_preview_menu()
 
     def _build_help_tab(self):
         v = QVBoxLayout(self.helpPage)
@@ -596,7 +1139,7 @@ class App(QWidget):
             QPushButton:hover{background:#232633}
             QLineEdit{background:#14161b;border:1px solid #2a2d36;padding:8px;border-radius:6px}
             QTableWidget{background:#121319;border:1px solid #2a2d36;gridline-color:#2a2d36}
-            QTextEdit{background:#0b0c10;border:1px solid #2a2d36}
+            QTextEdit, QPlainTextEdit{background:#0b0c10;border:1px solid #2a2d36}
             QProgressBar{border:1px solid #2a2d36;border-radius:6px;text-align:center;background:#14161b}
             QProgressBar::chunk{background:#4c8bf5}
             """
@@ -609,7 +1152,7 @@ class App(QWidget):
             QPushButton:hover{background:#f0f2f7}
             QLineEdit{background:#fff;border:1px solid #ccd2e0;padding:8px;border-radius:6px}
             QTableWidget{background:#fff;border:1px solid #ccd2e0;gridline-color:#ccd2e0}
-            QTextEdit{background:#fff;border:1px solid #ccd2e0}
+            QTextEdit, QPlainTextEdit{background:#fff;border:1px solid #ccd2e0}
             QProgressBar{border:1px solid #ccd2e0;border-radius:6px;text-align:center;background:#fff}
             QProgressBar::chunk{background:#4c8bf5}
             """
@@ -627,12 +1170,8 @@ class App(QWidget):
     def dropEvent(self, e):
         for url in e.mimeData().urls():
             p = url.toLocalFile()
-            if os.path.isfile(p) and os.path.splitext(p)[1].lower() in [
-                ".mp4",
-                ".mkv",
-                ".mov",
-                ".m4v",
-            ]:
+            ext = os.path.splitext(p)[1].lower()
+            if ext in VIDEO_EXTS and os.path.isfile(p):
                 self._add_to_queue(p)
 
     # ===== Pickers =====
@@ -671,37 +1210,66 @@ class App(QWidget):
         row = self.tbl.rowCount()
         self.tbl.insertRow(row)
         self.tbl.setRowHeight(row, 30)
-        self.tbl.setItem(row, self.COL_VIDEO, QTableWidgetItem(base))
-        self.tbl.setItem(row, self.COL_STATUS, QTableWidgetItem("queued"))
-        self.tbl.setItem(row, self.COL_PROGRESS, QTableWidgetItem("0%"))
-        self.tbl.setItem(row, self.COL_OUTPUTS, QTableWidgetItem("-"))
-        self.tbl.setItem(
-            row, self.COL_CODEC, QTableWidgetItem(self.cbCodec.currentText())
-        )
+        items = {
+            self.COL_VIDEO: QTableWidgetItem(base),
+            self.COL_STATUS: QTableWidgetItem("queued"),
+            self.COL_PROGRESS: QTableWidgetItem("0%"),
+            self.COL_OUTPUTS: QTableWidgetItem("-"),
+            self.COL_CODEC: QTableWidgetItem(self.cbCodec.currentText()),
+        }
+        for col, item in items.items():
+            self.tbl.setItem(row, col, item)
         self.row_of_base[base] = row
+        self.base_of_row.append(base)
+        self.row_items[base] = items
         return row
 
     def _current_base(self) -> str | None:
         row = self.tbl.currentRow()
-        if row < 0:
-            return None
-        item = self.tbl.item(row, self.COL_VIDEO)
-        return item.text() if item else None
+        if 0 <= row < len(self.base_of_row):
+            return self.base_of_row[row]
+        return None
 
     def _set_row(self, base: str, col: int, text: str):
-        row = self._ensure_row(base)
-        self.tbl.setItem(row, col, QTableWidgetItem(text))
+        self._ensure_row(base)
+        if not self._dirty_rows:
+            # update berikutnya dalam 100ms ikut flush yang sama
+            QTimer.singleShot(100, self._flush_rows)
+        self._dirty_rows.setdefault(base, {})[col] = text
+
+    def _flush_rows(self):
+        """
+        Tulis update tabel yang terkumpul sejak tick sebelumnya (satu repaint).
+        """
+        if not self._dirty_rows:
+            return
+        self.tbl.setUpdatesEnabled(False)
+        try:
+            for base, cols in self._dirty_rows.items():
+                items = self.row_items.get(base)
+                if not items:
+                    continue
+                for col, text in cols.items():
+                    item = items[col]
+                    if item.text() != text:
+                        item.setText(text)
+        finally:
+            self._dirty_rows.clear()
+            self.tbl.setUpdatesEnabled(True)
 
     def _set_row_progress(self, base: str, pct: int):
         self._set_row(base, self.COL_PROGRESS, f"{pct}%")
 
     def _update_item_status(self, base: str, status: str):
         self._set_row(base, self.COL_STATUS, status)
+        self._set_status(base, status)
 
     def _add_to_queue(self, path: str):
         base = os.path.splitext(os.path.basename(path))[0]
         self._ensure_row(base)
         self.queue_paths[base] = path
+        if base not in self.jobs:
+            self._set_status(base, "queued")
         self._log_line("INFO", f"[queue] {base}")
 
     # ===== Start/Cancel =====
@@ -736,12 +1304,13 @@ class App(QWidget):
             path,
             codec=self.cbCodec.currentText(),
             gpu=self.cbGPU.isChecked(),
+            hwdec=self.cbHwDec.isChecked(),
             renditions=rend,
             do_hls=self.cbHLS.isChecked(),
             do_dash=self.cbDASH.isChecked(),
             encrypt=self.cbEncrypt.isChecked(),
             extract_subs=self.cbExtractSubs.isChecked(),
-            srt_path=(self.edSrt.text().strip() or None),
+            srt_path=(self._srt_path or None),
         )
 
     def _start_job_for_path(
@@ -750,6 +1319,7 @@ class App(QWidget):
         *,
         codec: str,
         gpu: bool,
+        hwdec: bool,
         renditions: list[str],
         do_hls: bool,
         do_dash: bool,
@@ -762,7 +1332,7 @@ class App(QWidget):
             self._log_line("WARN", f"[encode] sudah berjalan → {base}")
             return
 
-        outdir = self.edOut.text().strip()
+        outdir = self._outdir
         if not os.path.isdir(outdir):
             try:
                 os.makedirs(outdir, exist_ok=True)
@@ -776,7 +1346,16 @@ class App(QWidget):
             )
             return
 
-        args = _child_cmd("encode.py") + [
+        flags = (
+            (True, "--gpu" if gpu else "--no-gpu"),
+            (gpu and not hwdec, "--no-hwaccel"),
+            (not do_hls, "--no-hls"),
+            (not do_dash, "--no-dash"),
+            (True, "--encrypt" if encrypt else "--no-encrypt"),
+            (extract_subs, "--extract-subs"),
+        )
+        args = [
+            *self._encode_cmd_base,
             "--input",
             path,
             "--outdir",
@@ -785,39 +1364,24 @@ class App(QWidget):
             codec,
             "--renditions",
             ",".join(renditions),
+            *(flag for on, flag in flags if on),
         ]
-        if gpu:
-            args.append("--gpu")
-        if not do_hls:
-            args.append("--no-hls")
-        if not do_dash:
-            args.append("--no-dash")
-        if encrypt:
-            args.append("--encrypt")
-        else:
-            args.append("--no-encrypt")
-        if extract_subs:
-            args.append("--extract-subs")
         if srt_path:
             args += ["--srt", srt_path]
 
         try:
-            p = subprocess.Popen(
-                args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-            )
+            p = self.children.spawn(base, args)
             self.jobs[base] = {
                 "proc": p,
                 "rend": {},
+                # jumlah pct semua rend (rata-rata O(1)) & pct bulat terakhir
+                "_rend_sum": 0.0,
+                "_last_pct": None,
                 "status": "running",
                 "hls": do_hls,
                 "dash": do_dash,
                 "outdir": outdir,
             }
-            ProcessReader(base, p, self.log_queue).start()
             self._ensure_row(base)
             self._log_line("INFO", f"[encode] start → {base}")
             self._update_item_status(base, "running")
@@ -836,6 +1400,20 @@ class App(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Gagal menjalankan encode:\n{e}")
 
+    def _start_watched_job(self, path: str, opts: dict):
+        self._start_job_for_path(
+            path,
+            codec=opts["codec"],
+            gpu=opts["gpu"],
+            hwdec=opts["hwdec"],
+            renditions=opts["renditions"],
+            do_hls=opts["hls"],
+            do_dash=opts["dash"],
+            encrypt=opts["encrypt"],
+            extract_subs=opts["extract_subs"],
+            srt_path=None,
+        )
+
     def cancel_selected(self):
         base = self._current_base()
         if not base:
@@ -865,11 +1443,11 @@ class App(QWidget):
         if self.watcher_thread and self.watcher_thread.is_alive():
             QMessageBox.information(self, "Info", "Watcher sudah berjalan.")
             return
-        in_dir = self.edWatchIn.text().strip()
+        in_dir = self._watch_in
         if not os.path.isdir(in_dir):
             QMessageBox.warning(self, "Warning", "Folder input tidak valid.")
             return
-        out_root = self.edOut.text().strip()
+        out_root = self._outdir
         if not os.path.isdir(out_root):
             QMessageBox.warning(
                 self, "Warning", "Folder output (tab Encoder) tidak valid."
@@ -897,15 +1475,14 @@ class App(QWidget):
             "out_root": out_root,
             "codec": self.wCodec.currentText(),
             "gpu": self.wGPU.isChecked(),
+            "hwdec": self.wHwDec.isChecked(),
             "renditions": rend,
             "hls": self.wHLS.isChecked(),
             "dash": self.wDASH.isChecked(),
             "encrypt": self.wEnc.isChecked(),
             "extract_subs": self.wSubs.isChecked(),
         }
-        self.watcher_thread = WatcherThread(
-            self, in_dir, opts, interval=2.0, stable_hits=3
-        )
+        self.watcher_thread = WatcherThread(self, in_dir, opts)
         self.watcher_thread.start()
         self.lblWatchState.setText("Status: watching")
         self._log_line(
@@ -942,16 +1519,14 @@ class App(QWidget):
         try:
             os.makedirs(root_dir, exist_ok=True)
             self.server_root_current = root_dir
-            args = _child_cmd("server.py") + [
+            args = self._server_cmd_base + [
                 "--root",
                 root_dir,
                 "--port",
                 str(self.app_port),
             ]
-            self.server_proc = subprocess.Popen(
-                args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
-            )
-            ProcessReader("_server", self.server_proc, self.log_queue).start()
+            # access log uvicorn per segmen tidak perlu lewat log GUI
+            self.server_proc = self.children.spawn("_server", args, log_path=SERVER_LOG)
             self._log_line(
                 "INFO", f"[server] http://127.0.0.1:{self.app_port} → {root_dir}"
             )
@@ -983,14 +1558,13 @@ class App(QWidget):
             )
             return
 
-        outdir = job.get("outdir") or self.edOut.text().strip()
+        outdir = job.get("outdir") or self._outdir
         self.start_server(outdir)
 
         meta_path = os.path.join(outdir, base, "player.json")
         hls_rel = dash_rel = vtt_rel = thumbs_rel = None
         try:
-            with open(meta_path, "r", encoding="utf-8") as f:
-                meta = json.load(f)
+            meta = load_player_meta(meta_path)
             srcs = meta.get("sources", {})
             hls_rel = srcs.get("hls")
             dash_rel = srcs.get("dash")
@@ -999,14 +1573,9 @@ class App(QWidget):
                 vtt_rel = str(tracks[0].get("src", "")) or None
             thumbs_rel = meta.get("thumbnails") or None
         except Exception:
-            if os.path.isfile(os.path.join(outdir, base, f"HLS/{base}.m3u8")):
-                hls_rel = f"HLS/{base}.m3u8"
-            if os.path.isfile(os.path.join(outdir, base, f"DASH/{base}.mpd")):
-                dash_rel = f"DASH/{base}.mpd"
-            if os.path.isfile(os.path.join(outdir, base, f"{base}.vtt")):
-                vtt_rel = f"{base}.vtt"
-            if os.path.isfile(os.path.join(outdir, base, "thumbs.vtt")):
-                thumbs_rel = "thumbs.vtt"
+            hls_rel, dash_rel, vtt_rel, thumbs_rel = fallback_sources(
+                os.path.join(outdir, base), base
+            )
 
         params = []
         if mode == "hls":
@@ -1028,85 +1597,68 @@ class App(QWidget):
             params.append(f"thumbs=/out/{base}/{thumbs_rel}")
 
         url = f"http://127.0.0.1:{self.app_port}/player?" + "&".join(params)
-        try:
-            os.startfile(url) if is_windows() else subprocess.Popen(["xdg-open", url])
+        # openUrl: Qt yang men-dispatch ke handler OS (tanpa fork xdg-open di sini)
+        if QDesktopServices.openUrl(QUrl(url)):
             self._log_line("INFO", f"[preview {mode}] {url}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Gagal membuka browser:\n{e}")
+        else:
+            QMessageBox.critical(self, "Error", f"Gagal membuka browser:\n{url}")
 
     # ===== Logs + Progress + Stats =====
-    def _format_log_html(self, level: str, text: str) -> str:
-        ts = datetime.now().strftime("%H:%M:%S")
-        safe = html.escape(text)
-        color = {
-            "INFO": "#cfd3dc",
-            "WARN": "#ffcc66",
-            "ERROR": "#ff6b6b",
-            "DONE": "#8fd18f",
-        }.get(level, "#cfd3dc")
-        return f'<span style="color:#8088a2">{ts}</span> <span style="color:{color}">{safe}</span>'
-
     def _log_line(self, level: str, text: str):
-        html_line = self._format_log_html(level, text) + "<br/>"
-        c = self.log.textCursor()
-        c.movePosition(QTextCursor.End)
-        self.log.setTextCursor(c)
-        c.insertHtml(html_line)
-        self.log.setTextCursor(c)
-        self.log.ensureCursorVisible()
-
-    def _pump_logs(self):
+        self.log.appendHtml(format_log_html(level, text))
+
+    def _append_log_html(self, lines: list):
+        # satu batch dari LogDispatcher -> satu repaint viewport
+        self.log.setUpdatesEnabled(False)
         try:
-            while True:
-                base, line = self.log_queue.get_nowait()
-                if line.startswith("PROGRESS "):
-                    try:
-                        parts = dict(
-                            kv.split("=", 1) for kv in line.split()[1:] if "=" in kv
-                        )
-                        b = parts.get("base", base)
-                        r = parts.get("rend")
-                        pct = float(parts.get("pct", "0"))
-                        job = self.jobs.get(b)
-                        if job is not None and r:
-                            job["rend"][r] = pct
-                    except Exception:
-                        pass
-                else:
-                    if "JOB_DONE base=" in line:
-                        b = line.split("JOB_DONE base=", 1)[1].strip()
-                        self._mark_done(b)
-                        continue
-                    if line.startswith("out_time_ms=") or line.startswith("progress="):
-                        continue
-                    L = "INFO"
-                    lower = line.lower()
-                    if "error" in lower or "failed" in lower or "traceback" in lower:
-                        L = "ERROR"
-                    elif line.startswith("[encode] cancel"):
-                        L = "WARN"
-                    self._log_line(L, line)
-        except queue.Empty:
-            pass
+            for h in lines:
+                self.log.appendHtml(h)
+        finally:
+            self.log.setUpdatesEnabled(True)
+
+    def _on_progress(self, base: str, rend: str, pct: float):
+        job = self.jobs.get(base)
+        if job is None:
+            return
+        rends = job["rend"]
+        job["_rend_sum"] += pct - rends.get(rend, 0.0)
+        rends[rend] = pct
+        val = int(job["_rend_sum"] / len(rends))
+        if val == job["_last_pct"]:
+            return
+        job["_last_pct"] = val
+        self._set_row_progress(base, val)
+        if base == self._current_base():
+            self.prog.setValue(val)
 
+    def _update_current_progress(self):
         base = self._current_base()
         if base:
             job = self.jobs.get(base)
             if job and job["rend"]:
-                val = int(mean(job["rend"].values()))
-                self.prog.setValue(val)
-                self._set_row_progress(base, val)
+                self.prog.setValue(job["_last_pct"])
             elif job and job.get("status") == "done":
                 self.prog.setValue(100)
                 self._set_row_progress(base, 100)
 
-    def _refresh_stats(self):
-        q = len([b for b in self.queue_paths.keys() if b not in self.jobs])
-        running = len([j for j in self.jobs.values() if j.get("status") == "running"])
-        done = len([j for j in self.jobs.values() if j.get("status") == "done"])
-        failed = len([j for j in self.jobs.values() if j.get("status") == "failed"])
+    def _set_status(self, base: str, status: str | None):
+        """
+        Pindahkan base ke status baru (None = hapus) dan update lblStats.
+        """
+        prev = self._status_of.get(base)
+        if prev == status:
+            return
+        c = self._status_counts
+        if prev:
+            c[prev] -= 1
+        if status:
+            self._status_of[base] = status
+            c[status] += 1
+        else:
+            self._status_of.pop(base, None)
         self.lblStats.setText(
-            f"Queued: {q} | Running: {running} | Done: {done} | Failed: {failed}"
+            f"Queued: {c['queued']} | Running: {c['running']} | "
+            f"Done: {c['done']} | Failed: {c['failed']}"
         )
 
     def _mark_done(self, base: str):
@@ -1118,16 +1670,23 @@ class App(QWidget):
             self._notify(f"Selesai: {base}")
             self._set_controls_enabled(not self._any_running())
             self._update_preview_buttons()
+            self._record_history_async(base, job.get("outdir") or self._outdir)
+
+    def _record_history_async(self, base: str, out_root: str):
+        # baca metadata + scan ukuran folder di worker; GUI flush batch via signal
+        def work():
             try:
-                self._history_record_job(
-                    base, job.get("outdir") or self.edOut.text().strip()
-                )
-                self.load_history()
+                self._history_record_job(base, out_root)
             except Exception as e:
-                self._log_line("WARN", f"[history] gagal tulis: {e}")
+                self.historyFailed.emit(str(e))
+            else:
+                self.historyRecorded.emit()
+
+        QThreadPool.globalInstance().start(work)
 
     def _on_selection_changed(self):
         self._update_preview_buttons()
+        self._update_current_progress()
         base = self._current_base()
         allow_cancel = bool(base and self.jobs.get(base, {}).get("status") == "running")
         self.btnCancel.setEnabled(allow_cancel)
@@ -1151,7 +1710,7 @@ class App(QWidget):
         self.btnPreviewD.setEnabled(bool(job.get("dash")))
 
     def _any_running(self) -> bool:
-        return any(j.get("status") == "running" for j in self.jobs.values())
+        return self._status_counts["running"] > 0
 
     def _set_controls_enabled(self, enabled: bool):
         for w in [
@@ -1160,6 +1719,7 @@ class App(QWidget):
             self.btnOut,
             self.cbCodec,
             self.cbGPU,
+            self.cbHwDec,
             self.cbHLS,
             self.cbDASH,
             self.cbEncrypt,
@@ -1191,17 +1751,25 @@ class App(QWidget):
             for b, j in list(self.jobs.items())
             if j.get("status") in ("done", "failed")
         ]
-        for b in remove_bases:
-            row = self.row_of_base.get(b)
-            if row is not None:
+        rows = sorted(
+            (self.row_of_base[b] for b in remove_bases if b in self.row_of_base),
+            reverse=True,
+        )
+        # hapus dari bawah supaya index baris lain tidak bergeser; repaint sekali
+        self.tbl.setUpdatesEnabled(False)
+        try:
+            for row in rows:
                 self.tbl.removeRow(row)
-                self.row_of_base.pop(b, None)
-                self.row_of_base = {}
-                for i in range(self.tbl.rowCount()):
-                    base_i = self.tbl.item(i, self.COL_VIDEO).text()
-                    self.row_of_base[base_i] = i
+                del self.base_of_row[row]
+        finally:
+            self.tbl.setUpdatesEnabled(True)
+        for b in remove_bases:
+            self.row_items.pop(b, None)
+            self._dirty_rows.pop(b, None)
             self.jobs.pop(b, None)
             self.queue_paths.pop(b, None)
+            self._set_status(b, None)
+        self.row_of_base = {b: i for i, b in enumerate(self.base_of_row)}
         self._log_line("INFO", f"[cleanup] removed {len(remove_bases)} finished job(s)")
         self.prog.setValue(0)
         self._update_preview_buttons()
@@ -1211,7 +1779,20 @@ class App(QWidget):
 
     # ===== History: DB =====
     def _init_db(self):
-        con = sqlite3.connect(self.db_path)
+        # satu koneksi untuk umur App; autocommit (isolation_level=None),
+        # penulisan multi-statement dibungkus BEGIN/COMMIT eksplisit
+        self.db = con = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        # koneksi dipakai lintas thread -> semua penulisan lewat lock ini
+        self._db_lock = threading.Lock()
+        # WAL: insert tidak memblokir pembaca; NORMAL: fsync hanya saat checkpoint
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA temp_store=MEMORY")
+        con.execute("PRAGMA mmap_size=268435456")
+        con.execute("PRAGMA cache_size=-20000")
+        con.execute("BEGIN")
         try:
             con.execute(
                 """
@@ -1235,19 +1816,69 @@ class App(QWidget):
             );"""
             )
             con.execute("CREATE INDEX IF NOT EXISTS idx_hist_base ON history(base);")
-        finally:
-            con.commit()
-            con.close()
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        self._fts = self._init_fts()
+
+    def _init_fts(self) -> bool:
+        """
+        Index FTS5 (external content) untuk pencarian riwayat, disinkronkan trigger.
+        False bila SQLite tanpa FTS5 -> load_history fallback ke LIKE.
+        """
+        con = self.db
+        cols = "base, codec, renditions, output_dir"
+        new = "new.base, new.codec, new.renditions, new.output_dir"
+        old = "old.base, old.codec, old.renditions, old.output_dir"
+        exists = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='history_fts'"
+        ).fetchone()
+        con.execute("BEGIN")
+        try:
+            con.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+                f"{cols}, content='history', content_rowid='id')"
+            )
+            con.execute(
+                f"""
+            CREATE TRIGGER IF NOT EXISTS history_fts_ai AFTER INSERT ON history BEGIN
+                INSERT INTO history_fts(rowid, {cols}) VALUES (new.id, {new});
+            END;"""
+            )
+            con.execute(
+                f"""
+            CREATE TRIGGER IF NOT EXISTS history_fts_ad AFTER DELETE ON history BEGIN
+                INSERT INTO history_fts(history_fts, rowid, {cols})
+                VALUES ('delete', old.id, {old});
+            END;"""
+            )
+            con.execute(
+                f"""
+            CREATE TRIGGER IF NOT EXISTS history_fts_au AFTER UPDATE ON history BEGIN
+                INSERT INTO history_fts(history_fts, rowid, {cols})
+                VALUES ('delete', old.id, {old});
+                INSERT INTO history_fts(rowid, {cols}) VALUES (new.id, {new});
+            END;"""
+            )
+            if not exists:
+                # DB lama: index baris yang sudah ada
+                con.execute("INSERT INTO history_fts(history_fts) VALUES ('rebuild')")
+            con.execute("COMMIT")
+            return True
+        except sqlite3.OperationalError:
+            con.execute("ROLLBACK")
+            return False
 
     def _folder_size(self, path: str) -> int:
-        total = 0
-        for root, _dirs, files in os.walk(path):
-            for f in files:
-                try:
-                    total += os.path.getsize(os.path.join(root, f))
-                except Exception:
-                    pass
-        return total
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return 0
+        size = self._size_cache.get(key)
+        if size is None:
+            size = self._size_cache[key] = folder_size(path)
+        return size
 
     def _history_record_job(self, base: str, out_root: str):
         job_dir = os.path.join(out_root, base)
@@ -1255,8 +1886,7 @@ class App(QWidget):
         jobj = os.path.join(job_dir, "job.json")
         if not os.path.isfile(player):
             raise FileNotFoundError("player.json tidak ditemukan untuk job ini.")
-        with open(player, "r", encoding="utf-8") as f:
-            meta = json.load(f)
+        meta = load_player_meta(player)
         hsrc = (meta.get("sources") or {}).get("hls")
         dsrc = (meta.get("sources") or {}).get("dash")
         tracks = (meta.get("tracks") or {}).get("subtitles") or []
@@ -1281,12 +1911,9 @@ class App(QWidget):
 
         sizeb = self._folder_size(job_dir)
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        con = sqlite3.connect(self.db_path)
-        try:
-            con.execute(
-                """
-            INSERT INTO history (base, output_dir, codec, hls, dash, encrypt, renditions, duration_ms, finished_at, poster, hls_path, dash_path, vtt, thumbs, size_bytes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        # ditulis batch oleh _flush_history (satu transaksi per burst job selesai)
+        with self._db_lock:
+            self._history_pending.append(
                 (
                     base,
                     out_root,
@@ -1303,84 +1930,161 @@ class App(QWidget):
                     vtt or "",
                     thumbs or "",
                     sizeb,
-                ),
+                )
             )
-        finally:
-            con.commit()
-            con.close()
 
-    def load_history(self):
-        q = (self.edSearch.text() or "").strip()
-        con = sqlite3.connect(self.db_path)
+    def _schedule_history_flush(self):
+        if not self._hist_flush_scheduled:
+            self._hist_flush_scheduled = True
+            QTimer.singleShot(500, self._flush_history)
+
+    def _flush_history(self):
+        self._hist_flush_scheduled = False
         try:
-            cur = con.cursor()
-            if q:
-                like = f"%{q}%"
-                cur.execute(
-                    """
-                SELECT id, finished_at, base, codec, hls, dash, encrypt, renditions, duration_ms, size_bytes, output_dir, hls_path, dash_path
-                FROM history
-                WHERE base LIKE ? OR codec LIKE ? OR renditions LIKE ? OR output_dir LIKE ?
-                ORDER BY id DESC
-                """,
-                    (like, like, like, like),
-                )
-            else:
-                cur.execute(
+            n = self._write_history_pending()
+        except Exception as e:
+            self._log_line("WARN", f"[history] gagal tulis: {e}")
+            return
+        if n:
+            self.load_history()
+
+    def _write_history_pending(self) -> int:
+        with self._db_lock:
+            rows, self._history_pending = self._history_pending, []
+            if not rows:
+                return 0
+            self.db.execute("BEGIN")
+            try:
+                self.db.executemany(
                     """
-                SELECT id, finished_at, base, codec, hls, dash, encrypt, renditions, duration_ms, size_bytes, output_dir, hls_path, dash_path
-                FROM history ORDER BY id DESC"""
+            INSERT INTO history (base, output_dir, codec, hls, dash, encrypt, renditions, duration_ms, finished_at, poster, hls_path, dash_path, vtt, thumbs, size_bytes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    rows,
                 )
-            rows = cur.fetchall()
-        finally:
-            con.close()
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return len(rows)
 
-        self.tblHist.setRowCount(0)
-        for row in rows:
-            (
-                id_,
-                ts,
-                base,
-                codec,
-                hls,
-                dash,
-                enc,
-                rend,
-                dur,
-                sizeb,
-                root,
-                hls_p,
-                dash_p,
-            ) = row
-            r = self.tblHist.rowCount()
-            self.tblHist.insertRow(r)
-            self.tblHist.setRowHeight(r, 28)
-            self.tblHist.setItem(r, 0, QTableWidgetItem(ts or ""))
-            self.tblHist.setItem(r, 1, QTableWidgetItem(base))
-            self.tblHist.setItem(r, 2, QTableWidgetItem(codec or ""))
-            outstr = (
-                ("HLS" if hls else "")
-                + ("+" if hls and dash else "")
-                + ("DASH" if dash else "")
+    def load_history(self):
+        q = (self.edSearch.text() or "").strip()
+        cur = self.db.cursor()
+        # FTS5: tiap kata jadi prefix query ("720"* AND "movie"*), lewat index
+        terms = re.findall(r"\w+", q) if self._fts else []
+        if terms:
+            cur.execute(
+                """
+            SELECT h.id, h.finished_at, h.base, h.codec, h.hls, h.dash, h.encrypt, h.renditions, h.duration_ms, h.size_bytes, h.output_dir, h.hls_path, h.dash_path
+            FROM history h JOIN history_fts f ON f.rowid = h.id
+            WHERE history_fts MATCH ?
+            ORDER BY h.id DESC LIMIT ?
+            """,
+                (" ".join(f'"{t}"*' for t in terms), self._hist_limit),
             )
-            if enc:
-                outstr += " (enc)"
-            self.tblHist.setItem(r, 3, QTableWidgetItem(outstr or "-"))
-            self.tblHist.setItem(r, 4, QTableWidgetItem(f"{int((dur or 0)/1000)} s"))
-            self.tblHist.setItem(r, 5, QTableWidgetItem(sizeof_fmt(sizeb or 0)))
-            self.tblHist.setItem(r, 6, QTableWidgetItem(root))
-            self.tblHist.setItem(
-                r,
-                7,
-                QTableWidgetItem(
-                    ("H" if hls and hls_p else "")
-                    + (" " if hls and dash else "")
-                    + ("D" if dash and dash_p else "")
-                ),
+        elif q:
+            like = f"%{q}%"
+            cur.execute(
+                """
+            SELECT id, finished_at, base, codec, hls, dash, encrypt, renditions, duration_ms, size_bytes, output_dir, hls_path, dash_path
+            FROM history
+            WHERE base LIKE ? OR codec LIKE ? OR renditions LIKE ? OR output_dir LIKE ?
+            ORDER BY id DESC LIMIT ?
+            """,
+                (like, like, like, like, self._hist_limit),
+            )
+        else:
+            cur.execute(
+                """
+            SELECT id, finished_at, base, codec, hls, dash, encrypt, renditions, duration_ms, size_bytes, output_dir, hls_path, dash_path
+            FROM history ORDER BY id DESC LIMIT ?""",
+                (self._hist_limit,),
             )
-            iditem = QTableWidgetItem(str(id_))
-            iditem.setData(Qt.UserRole, id_)
-            self.tblHist.setItem(r, 8, iditem)
+        rows = cur.fetchall()
+
+        # diff terhadap isi tabel: baris history tidak pernah berubah, jadi cukup
+        # hapus id yang hilang & sisipkan id baru (tanpa rebuild N item)
+        new_ids = [row[0] for row in rows]
+        if new_ids == self._hist_ids:
+            return
+        keep = set(new_ids)
+        self.tblHist.setUpdatesEnabled(False)
+        try:
+            for r in range(len(self._hist_ids) - 1, -1, -1):
+                if self._hist_ids[r] not in keep:
+                    self.tblHist.removeRow(r)
+                    del self._hist_ids[r]
+            # sisa baris = subsequence new_ids dengan urutan sama -> merge
+            for r, row in enumerate(rows):
+                if r >= len(self._hist_ids):
+                    break
+                if self._hist_ids[r] == row[0]:
+                    continue
+                self.tblHist.insertRow(r)
+                self._hist_fill_row(r, row)
+                self._hist_ids.insert(r, row[0])
+            # ekor (load awal / halaman scroll berikutnya): satu setRowCount
+            start = len(self._hist_ids)
+            if start < len(rows):
+                self.tblHist.setRowCount(len(rows))
+                for r in range(start, len(rows)):
+                    self._hist_fill_row(r, rows[r])
+                self._hist_ids.extend(new_ids[start:])
+        finally:
+            self.tblHist.setUpdatesEnabled(True)
+
+    def _hist_search(self):
+        self._hist_limit = HIST_PAGE
+        self.load_history()
+
+    def _hist_on_scroll(self, value: int):
+        sb = self.tblHist.verticalScrollBar()
+        if value >= sb.maximum() and len(self._hist_ids) >= self._hist_limit:
+            self._hist_limit += HIST_PAGE
+            self.load_history()
+
+    def _hist_fill_row(self, r: int, row: tuple):
+        (
+            id_,
+            ts,
+            base,
+            codec,
+            hls,
+            dash,
+            enc,
+            rend,
+            dur,
+            sizeb,
+            root,
+            hls_p,
+            dash_p,
+        ) = row
+        self.tblHist.setItem(r, 0, QTableWidgetItem(ts or ""))
+        self.tblHist.setItem(r, 1, QTableWidgetItem(base))
+        self.tblHist.setItem(r, 2, QTableWidgetItem(codec or ""))
+        outstr = (
+            ("HLS" if hls else "")
+            + ("+" if hls and dash else "")
+            + ("DASH" if dash else "")
+        )
+        if enc:
+            outstr += " (enc)"
+        self.tblHist.setItem(r, 3, QTableWidgetItem(outstr or "-"))
+        self.tblHist.setItem(r, 4, QTableWidgetItem(f"{int((dur or 0)/1000)} s"))
+        self.tblHist.setItem(r, 5, QTableWidgetItem(sizeof_fmt(sizeb or 0)))
+        self.tblHist.setItem(r, 6, QTableWidgetItem(root))
+        self.tblHist.setItem(
+            r,
+            7,
+            QTableWidgetItem(
+                ("H" if hls and hls_p else "")
+                + (" " if hls and dash else "")
+                + ("D" if dash and dash_p else "")
+            ),
+        )
+        iditem = QTableWidgetItem(str(id_))
+        iditem.setData(Qt.UserRole, id_)
+        self.tblHist.setItem(r, 8, iditem)
 
     def _selected_history_id(self) -> int | None:
         r = self.tblHist.currentRow()
@@ -1400,8 +2104,7 @@ class App(QWidget):
         player = os.path.join(out_root, base, "player.json")
         hls_rel = dash_rel = vtt_rel = thumbs_rel = None
         try:
-            with open(player, "r", encoding="utf-8") as f:
-                meta = json.load(f)
+            meta = load_player_meta(player)
             srcs = meta.get("sources", {})
             hls_rel = srcs.get("hls")
             dash_rel = srcs.get("dash")
@@ -1410,18 +2113,12 @@ class App(QWidget):
                 vtt_rel = str(tracks[0].get("src", "")) or None
             thumbs_rel = meta.get("thumbnails")
         except Exception:
-            if rec.get("hls"):
-                p = os.path.join(out_root, base, "HLS", f"{base}.m3u8")
-                if os.path.isfile(p):
-                    hls_rel = f"HLS/{base}.m3u8"
-            if rec.get("dash"):
-                p = os.path.join(out_root, base, "DASH", f"{base}.mpd")
-                if os.path.isfile(p):
-                    dash_rel = f"DASH/{base}.mpd"
-            if os.path.isfile(os.path.join(out_root, base, f"{base}.vtt")):
-                vtt_rel = f"{base}.vtt"
-            if os.path.isfile(os.path.join(out_root, base, "thumbs.vtt")):
-                thumbs_rel = "thumbs.vtt"
+            hls_rel, dash_rel, vtt_rel, thumbs_rel = fallback_sources(
+                os.path.join(out_root, base),
+                base,
+                hls=bool(rec.get("hls")),
+                dash=bool(rec.get("dash")),
+            )
         return hls_rel, dash_rel, vtt_rel, thumbs_rel
 
     def _history_update_preview_menu(self):
@@ -1470,11 +2167,10 @@ class App(QWidget):
         if thumbs_rel:
             params.append(f"thumbs=/out/{base}/{thumbs_rel}")
         url = f"http://127.0.0.1:{self.app_port}/player?" + "&".join(params)
-        try:
-            os.startfile(url) if is_windows() else subprocess.Popen(["xdg-open", url])
+        if QDesktopServices.openUrl(QUrl(url)):
             self._log_line("INFO", f"[history preview {mode}] {url}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Gagal membuka browser:\n{e}")
+        else:
+            QMessageBox.critical(self, "Error", f"Gagal membuka browser:\n{url}")
 
     def _history_preview_auto(self):
         if self.actHistHLS.isEnabled():
@@ -1495,62 +2191,74 @@ class App(QWidget):
         if not rec:
             return
         path = os.path.join(rec["output_dir"], rec["base"])
-        try:
-            os.startfile(path) if is_windows() else subprocess.Popen(["xdg-open", path])
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Gagal buka folder:\n{e}")
+        if not QDesktopServices.openUrl(QUrl.fromLocalFile(path)):
+            QMessageBox.critical(self, "Error", f"Gagal buka folder:\n{path}")
 
     def _get_history_record(self, hid: int) -> dict | None:
-        con = sqlite3.connect(self.db_path)
-        con.row_factory = sqlite3.Row
-        try:
-            cur = con.cursor()
-            cur.execute("SELECT * FROM history WHERE id=?", (hid,))
-            r = cur.fetchone()
-            return dict(r) if r else None
-        finally:
-            con.close()
+        cur = self.db.cursor()
+        cur.row_factory = sqlite3.Row
+        cur.execute("SELECT * FROM history WHERE id=?", (hid,))
+        r = cur.fetchone()
+        return dict(r) if r else None
 
     def clear_missing_history(self):
-        con = sqlite3.connect(self.db_path)
-        try:
-            cur = con.cursor()
-            cur.execute("SELECT id, output_dir, base FROM history")
-            rows = cur.fetchall()
-            removed = 0
-            for hid, root, base in rows:
-                if not os.path.isdir(os.path.join(root, base)):
-                    cur.execute("DELETE FROM history WHERE id=?", (hid,))
-                    removed += 1
-        finally:
-            con.commit()
-            con.close()
+        rows = self.db.execute("SELECT id, output_dir, base FROM history").fetchall()
+        # satu scandir per output_dir (bukan satu stat per baris)
+        dirs = {root: subdir_names(root) for root in {r[1] for r in rows}}
+        gone = [
+            (hid,)
+            for hid, root, base in rows
+            if os.path.normcase(base) not in dirs[root]
+        ]
+        if gone:
+            # satu transaksi = satu fsync untuk semua DELETE
+            with self._db_lock:
+                self.db.execute("BEGIN")
+                try:
+                    self.db.executemany("DELETE FROM history WHERE id=?", gone)
+                    self.db.execute("COMMIT")
+                except Exception:
+                    self.db.execute("ROLLBACK")
+                    raise
         self.load_history()
-        self._log_line("INFO", f"[history] removed {removed} missing record(s)")
+        self._log_line("INFO", f"[history] removed {len(gone)} missing record(s)")
 
     def delete_selected_history(self):
         hid = self._selected_history_id()
         if hid is None:
             return
-        con = sqlite3.connect(self.db_path)
-        try:
-            con.execute("DELETE FROM history WHERE id=?", (hid,))
-        finally:
-            con.commit()
-            con.close()
+        with self._db_lock:
+            self.db.execute("DELETE FROM history WHERE id=?", (hid,))
         self.load_history()
 
     # ===== Cleanup =====
     def closeEvent(self, ev):
-        for base, job in self.jobs.items():
-            p = job.get("proc")
-            if p and p.poll() is None:
-                try:
-                    p.terminate()
-                except Exception:
-                    pass
-        self.stop_server()
+        procs = [job.get("proc") for job in self.jobs.values()]
+        procs.append(self.server_proc)
+        procs = [p for p in procs if p and p.poll() is None]
+        # terminate semua dulu, lalu tunggu dengan deadline bersama (bukan 2s/proses)
+        for p in procs:
+            p.terminate()
+        deadline = time.monotonic() + 3.0
+        for p in procs:
+            try:
+                p.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                p.kill()
+        self.server_proc = None
         self.stop_watcher()
+        self.children.close()
+        self.log_dispatcher.requestInterruption()
+        self.log_dispatcher.wait(1000)
+        QThreadPool.globalInstance().waitForDone(2000)
+        try:
+            self._write_history_pending()
+        except Exception:
+            pass
+        try:
+            self.db.close()
+        except Exception:
+            pass
         super().closeEvent(ev)
 
 
@@ -1,18 +1,224 @@
 from pathlib import Path
+from collections import OrderedDict
+from stat import S_ISREG
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
-from fastapi import FastAPI
+from fastapi.responses import Response
+from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
-import uvicorn, os, argparse
+import uvicorn, os, argparse, gzip, asyncio, mimetypes, threading
 
+# Optional: varian brotli untuk /player
+try:
+    import brotli
+except Exception:
+    brotli = None
 
-class NoCacheStaticFiles(StaticFiles):
-    async def get_response(self, path, scope):
-        resp = await super().get_response(path, scope)
-        resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        resp.headers["Pragma"] = "no-cache"
-        return resp
+
+# bytes dibaca per hop worker thread (/out): segmen TS/M4S
+# umumnya < 8 MiB -> stat + open + baca cukup satu hop per request
+STATIC_CHUNK_SIZE = 8 << 20
+# fd terbuka per path (LRU) supaya segmen tidak di-open() ulang tiap request.
+# Windows: fd terbuka menahan delete/rename (hapus job, playlist yang ditulis
+# ulang ffmpeg) -> tanpa cache.
+FD_CACHE_MAX = 0 if os.name == "nt" else 256
+NO_CACHE_HEADERS = [
+    (b"cache-control", b"no-store, no-cache, must-revalidate, max-age=0"),
+    (b"pragma", b"no-cache"),
+]
+OUT_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mpd": "application/dash+xml",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+    ".vtt": "text/vtt",
+}
+
+
+def _route_path(scope) -> str:
+    # path relatif terhadap mount (Starlette lama: path sudah dipotong)
+    path, root = scope["path"], scope.get("root_path", "")
+    if root and path.startswith(root) and path[len(root) : len(root) + 1] in ("", "/"):
+        return path[len(root) :]
+    return path
+
+
+def _parse_range(value: str, size: int) -> tuple[int, int] | None:
+    """
+    Header Range satu rentang -> (start, end eksklusif). None = tidak valid (416).
+    Multi-range tidak didukung -> seluruh file.
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return (0, size)
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            start, end = max(0, size - int(last)), size
+        else:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+    except ValueError:
+        return None
+    if start >= end:
+        return None
+    return (start, end)
+
+
+def _pread(fd: int, n: int, offset: int) -> bytes:
+    """Baca sampai n byte mulai offset (pread bisa pendek; berhenti di EOF)."""
+    parts = []
+    while n > 0:
+        if hasattr(os, "pread"):
+            b = os.pread(fd, n, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            b = os.read(fd, n)
+        if not b:
+            break
+        parts.append(b)
+        n -= len(b)
+        offset += len(b)
+    return b"".join(parts)
+
+
+class OutFiles:
+    """
+    Pengganti StaticFiles untuk /out (playlist + segmen HLS/DASH).
+    fd di-cache LRU; stat, open dan span pertama dibaca dalam SATU hop worker
+    thread (event loop tidak pernah blok di filesystem). Range didukung.
+    """
+
+    def __init__(self, directory: str):
+        self.root = os.path.realpath(directory)
+        # path -> (fd, st_dev, st_ino); diakses dari worker thread -> lock
+        self._fds: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _drop(self, path: str):
+        ent = self._fds.pop(path, None)
+        if ent is not None:
+            os.close(ent[0])
+
+    def _open(self, path: str, st: os.stat_result) -> int:
+        """fd milik request (dup dari cache): aman walau entri cache di-evict."""
+        ent = self._fds.get(path)
+        if ent is not None and ent[1:] == (st.st_dev, st.st_ino):
+            self._fds.move_to_end(path)
+            return os.dup(ent[0])
+        # belum ada / file diganti (rename atomik ffmpeg) -> buka lagi
+        self._drop(path)
+        flags = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+        try:
+            fd = os.open(path, flags | getattr(os, "O_NOATIME", 0))
+        except PermissionError:
+            # O_NOATIME hanya boleh untuk pemilik file
+            fd = os.open(path, flags)
+        if not FD_CACHE_MAX:
+            return fd
+        self._fds[path] = (fd, st.st_dev, st.st_ino)
+        while len(self._fds) > FD_CACHE_MAX:
+            os.close(self._fds.popitem(last=False)[1][0])
+        return os.dup(fd)
+
+    def _prepare(self, path: str, rng: str | None, prefetch: bool):
+        """
+        Jalan di worker thread: stat (deteksi file diganti) + fd + Range + span
+        pertama. prefetch=False (HEAD) -> hanya header, tanpa fd.
+        Return (status, start, end, size, fd | None, data).
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._drop(path)
+            return 404, 0, 0, 0, None, b""
+        if not S_ISREG(st.st_mode):
+            return 404, 0, 0, 0, None, b""
+        size = st.st_size
+        start, end = 0, size
+        if rng is not None:
+            parsed = _parse_range(rng, size)
+            if parsed is None:
+                return 416, 0, 0, size, None, b""
+            start, end = parsed
+        code = 206 if (start, end) != (0, size) else 200
+        if end == start or not prefetch:
+            return code, start, end, size, None, b""
+        with self._lock:
+            fd = self._open(path, st)
+        try:
+            data = _pread(fd, min(STATIC_CHUNK_SIZE, end - start), start)
+        except OSError:
+            os.close(fd)
+            raise
+        return code, start, end, size, fd, data
+
+    async def _status(self, send, code: int, headers=()):
+        hdrs = NO_CACHE_HEADERS + [(b"content-length", b"0"), *headers]
+        await send({"type": "http.response.start", "status": code, "headers": hdrs})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            return await self._status(send, 405, [(b"allow", b"GET, HEAD")])
+        rel = _route_path(scope).lstrip("/")
+        path = os.path.realpath(os.path.join(self.root, rel))
+        if not path.startswith(self.root + os.sep):
+            return await self._status(send, 404)
+        rng = next((v for k, v in scope["headers"] if k == b"range"), None)
+        code, start, end, size, fd, data = await asyncio.to_thread(
+            self._prepare,
+            path,
+            rng.decode("latin-1") if rng is not None else None,
+            method == "GET",
+        )
+        if code == 404:
+            return await self._status(send, 404)
+        if code == 416:
+            cr = f"bytes */{size}".encode()
+            return await self._status(send, 416, [(b"content-range", cr)])
+
+        try:
+            headers = list(NO_CACHE_HEADERS)
+            if code == 206:
+                cr = f"bytes {start}-{end - 1}/{size}".encode()
+                headers.append((b"content-range", cr))
+            ext = os.path.splitext(path)[1].lower()
+            ctype = (
+                OUT_MEDIA_TYPES.get(ext)
+                or mimetypes.guess_type(path)[0]
+                or "application/octet-stream"
+            )
+            headers += [
+                (b"content-type", ctype.encode()),
+                (b"content-length", str(end - start).encode()),
+                (b"accept-ranges", b"bytes"),
+            ]
+            await send(
+                {"type": "http.response.start", "status": code, "headers": headers}
+            )
+            if method == "HEAD" or fd is None:
+                return await send({"type": "http.response.body", "body": b""})
+            off = start
+            while True:
+                off += len(data)
+                more = bool(data) and off < end
+                await send(
+                    {"type": "http.response.body", "body": data, "more_body": more}
+                )
+                if not more:
+                    # selesai, atau file menyusut di tengah jalan
+                    return
+                n = min(STATIC_CHUNK_SIZE, end - off)
+                data = await asyncio.to_thread(_pread, fd, n, off)
+        finally:
+            if fd is not None:
+                os.close(fd)
 
 
 app = FastAPI()
@@ -27,12 +233,22 @@ if ASSETS_DIR.exists():
     )
 
 
+def _read_favicon() -> bytes | None:
+    try:
+        return (ASSETS_DIR / "app.ico").read_bytes()
+    except OSError:
+        return None
+
+
+# dibaca sekali saat start; request favicon tanpa stat/open
+FAVICON_BYTES = _read_favicon()
+
+
 @app.get("/favicon.ico")
-def favicon():
-    ico = ASSETS_DIR / "app.ico"
-    if ico.exists():
-        return FileResponse(str(ico), media_type="image/x-icon")
-    return Response(status_code=404)
+async def favicon():
+    if FAVICON_BYTES is None:
+        return Response(status_code=404)
+    return Response(FAVICON_BYTES, media_type="image/x-icon")
 
 
 # Web Preview (Plyr.io)
@@ -182,9 +398,25 @@ HTML = """<!doctype html>
 """
 
 
+HTML_BYTES = HTML.encode("utf-8")
+# dikompres sekali saat import, bukan per request
+HTML_GZ = gzip.compress(HTML_BYTES, 9)
+HTML_BR = brotli.compress(HTML_BYTES) if brotli else None
+
+
 @app.get("/player", response_class=HTMLResponse)
-def player():
-    return HTML
+async def player(request: Request):
+    accept = request.headers.get("accept-encoding", "")
+    headers = {"Vary": "Accept-Encoding"}
+    if HTML_BR is not None and "br" in accept:
+        body = HTML_BR
+        headers["Content-Encoding"] = "br"
+    elif "gzip" in accept:
+        body = HTML_GZ
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = HTML_BYTES
+    return HTMLResponse(content=body, headers=headers)
 
 
 def main():
@@ -193,7 +425,7 @@ def main():
     ap.add_argument("--port", type=int, default=8787)
     args = ap.parse_args()
     os.makedirs(args.root, exist_ok=True)
-    app.mount("/out", NoCacheStaticFiles(directory=args.root), name="out")
+    app.mount("/out", OutFiles(args.root), name="out")
     uvicorn.run(app, host="127.0.0.1", port=args.port)
 
 
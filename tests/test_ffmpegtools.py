@@ -0,0 +1,41 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from utils.ffmpegtools import parse_out_time_ms
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class ParseOutTimeMsTest(unittest.TestCase):
+    def test_microseconds_to_ms(self):
+        # ffmpeg -progress: out_time_ms=5000000 berarti 5 detik
+        self.assertEqual(parse_out_time_ms(b"out_time_ms=5000000\n"), 5000.0)
+        self.assertEqual(parse_out_time_ms(b"out_time_ms=1500"), 1.5)
+
+    def test_not_available(self):
+        self.assertIsNone(parse_out_time_ms(b"out_time_ms=N/A\n"))
+
+
+class RunProgressTest(unittest.TestCase):
+    def test_pct_from_microseconds(self):
+        # "ffmpeg" palsu: cetak progress 2.5 s dari total 10 s -> 25%
+        fake = "print('out_time_ms=2500000'); print('progress=continue')"
+        code = (
+            "from utils.ffmpegtools import run; import sys; "
+            f"run([sys.executable, '-c', {fake!r}], "
+            "progress={'total_ms': 10000, 'base': 'b', 'label': 'hls'})"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            check=True,
+            text=True,
+        ).stdout
+        self.assertIn("PROGRESS base=b rend=hls pct=25.00", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,29 @@
-import os, secrets, subprocess, pathlib, shutil
+import os, sys, json, secrets, subprocess, pathlib, tempfile, atexit
 from typing import List, Dict, Optional
 
+from utils.hwaccel import detect_hw_encoder, hwaccel_args
+from utils.paths import find_ffprobe
+from utils.probe import probe_info
+
+# Optional: durasi dari header container tanpa ffprobe
+try:
+    from mutagen import File as MutagenFile
+except Exception:
+    MutagenFile = None
+
+DUR_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "streamcode",
+    "durations.json",
+)
+# "path|mtime_ns|size" -> durasi ms; dimuat dari DUR_CACHE_PATH saat pertama dipakai
+_DUR_CACHE: Optional[Dict[str, int]] = None
+# ada entri baru yang belum ditulis ke disk
+_DUR_DIRTY = False
+
+# CODECS untuk master playlist: "video,audio" per codec_id
+CODEC_TAGS = {"h264": "avc1.640029,mp4a.40.2", "hevc": "hvc1,mp4a.40.2"}
+
 
 def ensure_dir(p: str):
     pathlib.Path(p).mkdir(parents=True, exist_ok=True)
@@ -9,74 +32,165 @@ def ensure_dir(p: str):
 def make_hls_key(out_dir: str):
     ensure_dir(out_dir)
     key_path = os.path.join(out_dir, "key.key")
-    with open(key_path, "wb") as f:
-        f.write(secrets.token_bytes(16))
+    # satu syscall write, file kunci hanya bisa dibaca pemilik (0600)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    flags |= getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0)
+    fd = os.open(key_path, flags, 0o600)
+    try:
+        os.write(fd, secrets.token_bytes(16))
+    finally:
+        os.close(fd)
     keyinfo_path = os.path.join(out_dir, "key.keyinfo")
     uri = "key.key"
     iv_hex = secrets.token_hex(16)
-    with open(keyinfo_path, "w", newline="\n") as f:
-        f.write(uri + "\n")
-        f.write(key_path + "\n")
-        f.write(iv_hex + "\n")
+    data = f"{uri}\n{key_path}\n{iv_hex}\n".encode()
+    # tulis ke .tmp lalu replace: ffmpeg tidak pernah membaca keyinfo setengah jadi
+    tmp = keyinfo_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, keyinfo_path)
     return keyinfo_path
 
 
-def build_scale_filter(w: int, h: int):
+def resolve_vcodec(ffmpeg: str, vcodec: str) -> str:
+    """libx264/libx265 -> encoder hardware kalau ada, selain itu apa adanya."""
+    codec = {"libx264": "h264", "libx265": "hevc"}.get(vcodec)
+    if codec is None:
+        return vcodec
+    return detect_hw_encoder(ffmpeg, codec) or vcodec
+
+
+def hw_encoder_opts(vcodec: str, spec: str = "") -> List[str]:
+    """Opsi rate control per encoder hardware; spec = stream specifier (":v:0")."""
+    if vcodec.endswith("_nvenc"):
+        return [f"-preset{spec}", "p4", f"-tune{spec}", "hq", f"-rc{spec}", "vbr"]
+    return []
+
+
+def build_scale_filter(w: int, h: int, vcodec: str = ""):
+    if vcodec.endswith("_nvenc"):
+        return f"scale_cuda=w={w}:h={h}:force_original_aspect_ratio=decrease"
+    if vcodec.endswith("_qsv"):
+        # scale_qsv tidak punya force_original_aspect_ratio; hitung manual
+        return f"scale_qsv=w='min({w},iw*{h}/ih)':h='min({h},ih*{w}/iw)'"
     return f"scale=w={w}:h={h}:force_original_aspect_ratio=decrease"
 
 
-def _resolve_ffprobe(ffmpeg_path: str) -> Optional[str]:
-    d = os.path.dirname(ffmpeg_path)
-    cands = []
-    if d:
-        cands.append(os.path.join(d, "ffprobe.exe"))
-    cands.append("ffprobe")
-    for c in cands:
-        if os.path.isfile(c):
-            return c
-        w = shutil.which(c)
-        if w:
-            return w
-    return None
+def build_split_scale(ladders: List[Dict], vcodec: str = "") -> str:
+    """
+    filter_complex multi-output: split sekali, lalu satu scale per rendition
+    (label [v{i}o]). Dengan hwaccel, split & scale jalan di surface GPU.
+    """
+    n = len(ladders)
+    split = f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(n))
+    scales = [
+        f"[v{i}]{build_scale_filter(L['width'], L['height'], vcodec)}[v{i}o]"
+        for i, L in enumerate(ladders)
+    ]
+    return split + ";" + ";".join(scales)
+
+
+def _ffprobe_duration_ms(ffmpeg: str, inp: str) -> Optional[int]:
+    if not find_ffprobe(ffmpeg):
+        return None
+    try:
+        return int(float(probe_info(ffmpeg, inp)["format"]["duration"]) * 1000)
+    except Exception:
+        return None
 
 
-def probe_duration_ms(ffmpeg: str, inp: str) -> Optional[int]:
-    ffprobe = _resolve_ffprobe(ffmpeg)
-    if not ffprobe:
+def _mutagen_duration_ms(inp: str) -> Optional[int]:
+    # baca header container langsung (mp4/m4a/ogg/...), tanpa spawn ffprobe
+    if MutagenFile is None:
         return None
     try:
-        # returns seconds as float
-        out = subprocess.check_output(
-            (
-                [
-                    ffprobe,
-                    "-v",
-                    "error",
-                    "-show_entries",
-                    "format=duration",
-                    "-of",
-                    "default=nw=1:nk=1",
-                    "-i",
-                    inp,
-                ]
-                if ffprobe.endswith(".exe")
-                else [
-                    ffprobe,
-                    "-v",
-                    "error",
-                    "-show_entries",
-                    "format=duration",
-                    "-of",
-                    "default=nw=1:nk=1",
-                    inp,
-                ]
-            ),
-            universal_newlines=True,
-        ).strip()
-        sec = float(out)
-        return int(sec * 1000)
+        f = MutagenFile(inp)
+        length = f.info.length if f is not None else 0
     except Exception:
         return None
+    return int(length * 1000) if length else None
+
+
+def _dur_cache() -> Dict[str, int]:
+    global _DUR_CACHE
+    if _DUR_CACHE is None:
+        try:
+            with open(DUR_CACHE_PATH, "r", encoding="utf-8") as f:
+                _DUR_CACHE = json.load(f)
+        except Exception:
+            _DUR_CACHE = {}
+        # disimpan sekali saat proses selesai, bukan per miss
+        atexit.register(flush_dur_cache)
+    return _DUR_CACHE
+
+
+def flush_dur_cache():
+    """
+    Tulis entri durasi baru ke DUR_CACHE_PATH (dipanggil otomatis saat exit;
+    boleh dipanggil manual di akhir batch). Entri proses lain yang sudah ada di
+    disk digabung dulu; tmp per proses supaya os.replace tidak saling tabrak.
+    """
+    global _DUR_DIRTY
+    if not _DUR_DIRTY or _DUR_CACHE is None:
+        return
+    d = os.path.dirname(DUR_CACHE_PATH)
+    try:
+        ensure_dir(d)
+        merged = {}
+        try:
+            with open(DUR_CACHE_PATH, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+        except Exception:
+            pass
+        merged.update(_DUR_CACHE)
+        fd, tmp = tempfile.mkstemp(dir=d, prefix="durations.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+            os.replace(tmp, DUR_CACHE_PATH)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        _DUR_DIRTY = False
+    except OSError:
+        pass
+
+
+def probe_duration_ms(ffmpeg: str, inp: str) -> Optional[int]:
+    """
+    Durasi input (ms), di-cache per (path, mtime, size) dan disimpan di
+    DUR_CACHE_PATH antar run (ditulis sekali saat exit, lihat flush_dur_cache).
+    Miss: mutagen jika ada, lalu ffprobe.
+    """
+    global _DUR_DIRTY
+    try:
+        st = os.stat(inp)
+    except OSError:
+        # bukan file lokal (URL dsb.) -> langsung ffprobe, tanpa cache
+        return _ffprobe_duration_ms(ffmpeg, inp)
+    key = f"{os.path.abspath(inp)}|{st.st_mtime_ns}|{st.st_size}"
+    cache = _dur_cache()
+    if key in cache:
+        return cache[key]
+    ms = _mutagen_duration_ms(inp) or _ffprobe_duration_ms(ffmpeg, inp)
+    if ms is not None:
+        cache[key] = ms
+        _DUR_DIRTY = True
+    return ms
+
+
+def parse_out_time_ms(raw: bytes) -> Optional[float]:
+    """
+    Baris `out_time_ms=...` dari `-progress` -> milidetik. Walau namanya "_ms",
+    nilainya mikrodetik (sama seperti out_time_us). None untuk "N/A" dsb.
+    """
+    try:
+        return int(raw.partition(b"=")[2]) / 1000.0
+    except ValueError:
+        return None
 
 
 def run(cmd: List[str], progress: Optional[dict] = None):
@@ -85,32 +199,31 @@ def run(cmd: List[str], progress: Optional[dict] = None):
     Jika progress diberikan: {total_ms:int|None, base:str, label:str}
     maka saat menerima baris 'out_time_ms=' akan cetak:
       PROGRESS base=<base> rend=<label> pct=<xx.xx>
+    Pipe dibaca sebagai bytes (tanpa decode per baris); PROGRESS hanya dicetak
+    tiap maju >= 0.1% supaya stdout tidak banjir.
     """
-    p = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-        bufsize=1,
-    )
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     total_ms = progress.get("total_ms") if progress else None
     base = progress.get("base") if progress else None
     label = progress.get("label") if progress else None
+    inv_total = 100.0 / total_ms if total_ms and total_ms > 0 else 0.0
+    step = total_ms / 1000 if inv_total else 0
+    last_ms = None
+    out = sys.stdout.buffer
 
     for raw in p.stdout:
-        line = raw.strip()
-        if progress and line.startswith("out_time_ms="):
-            try:
-                out_ms = int(line.split("=", 1)[1])
-                if total_ms and total_ms > 0:
-                    pct = max(0.0, min(100.0, (out_ms / total_ms) * 100.0))
-                else:
-                    pct = 0.0
-                print(f"PROGRESS base={base} rend={label} pct={pct:.2f}", flush=True)
-            except Exception:
-                pass
+        if progress and raw.startswith(b"out_time_ms="):
+            out_ms = parse_out_time_ms(raw)
+            if out_ms is None:
+                continue
+            if last_ms is not None and out_ms - last_ms < step:
+                continue
+            last_ms = out_ms
+            pct = max(0.0, min(100.0, out_ms * inv_total))
+            print(f"PROGRESS base={base} rend={label} pct={pct:.2f}", flush=True)
         else:
-            print(line, flush=True)
+            out.write(raw.strip() + b"\n")
+            out.flush()
     p.wait()
     if p.returncode != 0:
         raise RuntimeError(f"FFmpeg failed: {p.returncode}")
@@ -131,7 +244,16 @@ def hls_per_rendition(
     keyinfo: str | None,
     total_ms: Optional[int],
     base: str,
+    hw: bool = True,
 ):
+    """
+    Satu rendition HLS per proses ffmpeg.
+    hw=True (default): libx264/libx265 otomatis diganti encoder hardware yang
+    terdeteksi (NVENC/QSV/VideoToolbox, + decode & scale GPU); hw=False untuk
+    memaksa encoder CPU sesuai vcodec.
+    """
+    if hw:
+        vcodec = resolve_vcodec(ffmpeg, vcodec)
     rname = ladder["name"]
     w, h = ladder["width"], ladder["height"]
     rdir = os.path.join(outdir, rname)
@@ -140,6 +262,7 @@ def hls_per_rendition(
         ffmpeg,
         "-y",
         "-hide_banner",
+        *hwaccel_args(vcodec),
         "-i",
         inp,
         "-map",
@@ -148,6 +271,7 @@ def hls_per_rendition(
         "0:a:0",
         "-c:v",
         vcodec,
+        *hw_encoder_opts(vcodec),
         "-b:v",
         f'{ladder["bitrate_k"]}k',
         "-maxrate",
@@ -163,7 +287,7 @@ def hls_per_rendition(
         "-sc_threshold",
         "0",
         "-vf",
-        build_scale_filter(w, h),
+        build_scale_filter(w, h, vcodec),
         "-c:a",
         acodec,
         "-b:a",
@@ -192,22 +316,110 @@ def hls_per_rendition(
     return rname
 
 
+def hls_multi(
+    ffmpeg: str,
+    inp: str,
+    outdir: str,
+    ladders: List[Dict],
+    vcodec: str,
+    acodec: str,
+    gop: int,
+    fps: int,
+    ar: int,
+    ab_k: int,
+    channels: int,
+    keyinfo: str | None,
+    total_ms: Optional[int],
+    base: str,
+    hw: bool = True,
+):
+    """
+    Semua rendition HLS dalam satu proses ffmpeg: decode sekali, split + scale
+    per rendition (seperti dash_multi), lalu satu output HLS per rendition.
+    hw=True (default): libx264/libx265 otomatis diganti encoder hardware yang
+    terdeteksi (NVENC/QSV/VideoToolbox, + decode & scale GPU); hw=False untuk
+    memaksa encoder CPU sesuai vcodec.
+    """
+    if hw:
+        vcodec = resolve_vcodec(ffmpeg, vcodec)
+    fc = build_split_scale(ladders, vcodec)
+    args = [ffmpeg, "-y", "-hide_banner", *hwaccel_args(vcodec), "-i", inp]
+    args += ["-filter_complex", fc]
+    args += ["-progress", "pipe:1", "-nostats"]
+    for i, L in enumerate(ladders):
+        rdir = os.path.join(outdir, L["name"])
+        ensure_dir(rdir)
+        args += [
+            "-map",
+            f"[v{i}o]",
+            "-map",
+            "0:a:0",
+            "-c:v",
+            vcodec,
+            *hw_encoder_opts(vcodec),
+            "-b:v",
+            f"{L['bitrate_k']}k",
+            "-maxrate",
+            f"{L['maxrate_k']}k",
+            "-bufsize",
+            f"{L['bufsize_k']}k",
+            "-r",
+            str(fps),
+            "-g",
+            str(gop * fps),
+            "-keyint_min",
+            str(gop * fps),
+            "-sc_threshold",
+            "0",
+            "-c:a",
+            acodec,
+            "-b:a",
+            f"{ab_k}k",
+            "-ac",
+            str(channels),
+            "-ar",
+            str(ar),
+            "-f",
+            "hls",
+            "-hls_time",
+            str(gop * 2),
+            "-hls_playlist_type",
+            "vod",
+            "-hls_flags",
+            "independent_segments",
+        ]
+        if keyinfo:
+            args += ["-hls_key_info_file", keyinfo]
+        args += [
+            "-hls_segment_filename",
+            os.path.join(rdir, "seg_%05d.ts"),
+            os.path.join(rdir, "index.m3u8"),
+        ]
+    run(args, progress={"total_ms": total_ms, "base": base, "label": "hls"})
+    return [L["name"] for L in ladders]
+
+
 def write_hls_master(
     outdir: str, master_name: str, ladders: List[Dict], audio_kbps: int, codec_id: str
 ):
-    vtag = "avc1.640029" if codec_id == "h264" else "hvc1"
-    atag = "mp4a.40.2"
+    tags = CODEC_TAGS.get(codec_id, CODEC_TAGS["hevc"])
     master_path = os.path.join(outdir, master_name)
     lines = ["#EXTM3U"]
     for L in ladders:
         bw = (L["maxrate_k"] + audio_kbps) * 1000
         res = f'{L["width"]}x{L["height"]}'
         lines += [
-            f'#EXT-X-STREAM-INF:BANDWIDTH={bw},RESOLUTION={res},CODECS="{vtag},{atag}"',
+            f'#EXT-X-STREAM-INF:BANDWIDTH={bw},RESOLUTION={res},CODECS="{tags}"',
             f'{L["name"]}/index.m3u8',
         ]
-    with open(master_path, "w", newline="\n") as f:
-        f.write("\n".join(lines))
+    # satu encode + satu write syscall (tanpa translasi newline text-mode)
+    payload = ("\n".join(lines) + "\n").encode("utf-8")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    fd = os.open(master_path, flags, 0o644)
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
     return master_path
 
 
@@ -226,37 +438,36 @@ def dash_multi(
     channels: int,
     total_ms: Optional[int],
     base: str,
+    hw: bool = True,
 ):
+    """
+    Semua rendition DASH dalam satu proses ffmpeg (split + scale, satu MPD).
+    hw=True (default): libx264/libx265 otomatis diganti encoder hardware yang
+    terdeteksi (NVENC/QSV/VideoToolbox, + decode & scale GPU); hw=False untuk
+    memaksa encoder CPU sesuai vcodec.
+    """
+    if hw:
+        vcodec = resolve_vcodec(ffmpeg, vcodec)
     ensure_dir(outdir)
-    n = len(ladders)
-    split = f"[0:v]split={n}" + "".join([f"[v{i}]" for i in range(n)]) + ";"
-    scales = []
-    for i, L in enumerate(ladders):
-        scales.append(
-            f"[v{i}]scale=w={L['width']}:h={L['height']}:force_original_aspect_ratio=decrease[v{i}o]"
-        )
-    fc = split + "".join(scales)
-    args = [ffmpeg, "-y", "-hide_banner", "-i", inp, "-filter_complex", fc]
+    fc = build_split_scale(ladders, vcodec)
+    args = [ffmpeg, "-y", "-hide_banner", *hwaccel_args(vcodec), "-i", inp]
+    args += ["-filter_complex", fc]
     for i, L in enumerate(ladders):
         args += ["-map", f"[v{i}o]"]
         args += [
             "-c:v:" + str(i),
             vcodec,
+            *hw_encoder_opts(vcodec, ":v:" + str(i)),
             "-b:v:" + str(i),
             f"{L['bitrate_k']}k",
             "-maxrate:v:" + str(i),
             f"{L['maxrate_k']}k",
             "-bufsize:v:" + str(i),
             f"{L['bufsize_k']}k",
-            "-r",
-            str(fps),
-            "-g",
-            str(gop * fps),
-            "-keyint_min",
-            str(gop * fps),
-            "-sc_threshold",
-            "0",
         ]
+    # sama untuk semua rendition: cukup sekali per output (GOP selaras antar rung)
+    args += ["-r", str(fps), "-g", str(gop * fps), "-keyint_min", str(gop * fps)]
+    args += ["-sc_threshold", "0"]
     args += [
         "-map",
         "0:a:0",
@@ -0,0 +1,77 @@
+import subprocess
+from functools import lru_cache
+from typing import List, Optional
+
+from utils.proc import POPEN_KW
+
+# urutan preferensi encoder hardware (suffix nama encoder ffmpeg)
+HW_ENCODERS = ("nvenc", "qsv", "videotoolbox")
+
+
+@lru_cache(maxsize=None)
+def list_encoders(ffmpeg: str) -> str:
+    """
+    Output `ffmpeg -encoders` (di-cache per binary, cukup sekali per proses).
+    """
+    try:
+        return subprocess.check_output(
+            [ffmpeg, "-hide_banner", "-encoders"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+            **POPEN_KW,
+        )
+    except Exception:
+        return ""
+
+
+@lru_cache(maxsize=None)
+def encoder_works(ffmpeg: str, enc: str) -> bool:
+    """
+    Encoder terdaftar di `ffmpeg -encoders` DAN bisa encode 1 frame: build statis
+    sering menyertakan nvenc/qsv walau GPU-nya tidak ada.
+    """
+    if f" {enc} " not in list_encoders(ffmpeg):
+        return False
+    try:
+        return (
+            subprocess.run(
+                [ffmpeg, "-hide_banner", "-v", "error", "-f", "lavfi"]
+                + ["-i", "color=s=256x144:d=0.1", "-frames:v", "1"]
+                + ["-c:v", enc, "-f", "null", "-"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=15,
+                **POPEN_KW,
+            ).returncode
+            == 0
+        )
+    except Exception:
+        return False
+
+
+def has_nvenc(ffmpeg: str, codec: str) -> bool:
+    return encoder_works(ffmpeg, "h264_nvenc" if codec == "h264" else "hevc_nvenc")
+
+
+def detect_hw_encoder(ffmpeg: str, codec: str = "h264") -> Optional[str]:
+    """
+    Encoder hardware pertama yang tersedia & benar-benar jalan untuk codec
+    ("h264"/"hevc"), mis. "h264_nvenc". None -> pakai encoder CPU.
+    """
+    for hw in HW_ENCODERS:
+        enc = f"{codec}_{hw}"
+        if encoder_works(ffmpeg, enc):
+            return enc
+    return None
+
+
+def hwaccel_args(vcodec: str) -> List[str]:
+    """
+    Decode di GPU dan biarkan frame tetap di VRAM (decode -> scale GPU -> encode).
+    Sisipkan sebelum `-i`; graph filter harus memakai scale GPU yang sesuai.
+    """
+    if vcodec.endswith("_nvenc"):
+        return ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+    if vcodec.endswith("_qsv"):
+        return ["-hwaccel", "qsv", "-hwaccel_output_format", "qsv"]
+    return []
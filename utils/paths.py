@@ -0,0 +1,19 @@
+import os
+import shutil
+from functools import lru_cache
+from typing import Optional
+
+
+@lru_cache(maxsize=8)
+def find_ffprobe(ffmpeg_bin: str) -> Optional[str]:
+    """
+    ffprobe di folder yang sama dengan ffmpeg, lalu di PATH; None jika tidak ada.
+    Di-cache per path ffmpeg (isfile/which cukup sekali per proses).
+    """
+    exe = "ffprobe.exe" if os.name == "nt" else "ffprobe"
+    d = os.path.dirname(ffmpeg_bin or "")
+    if d:
+        cand = os.path.join(d, exe)
+        if os.path.isfile(cand):
+            return cand
+    return shutil.which(exe)
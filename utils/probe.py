@@ -0,0 +1,47 @@
+import os
+import json
+import subprocess
+from functools import lru_cache
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+from utils.paths import find_ffprobe
+from utils.proc import POPEN_KW
+
+
+@lru_cache(maxsize=64)
+def _probe_info(ffprobe: str, path: str, mtime_ns: int, size: int) -> dict:
+    # mtime_ns/size hanya kunci cache: file berubah -> probe ulang
+    out = subprocess.run(
+        [
+            ffprobe,
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            "-i",
+            path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        **POPEN_KW,
+    ).stdout
+    return (orjson.loads(out) if orjson else json.loads(out)) if out else {}
+
+
+def probe_info(ffmpeg_bin: str, inp: str) -> dict:
+    """
+    Satu kali `ffprobe -show_format -show_streams` per file (di-cache per
+    path+mtime+size); durasi & daftar subtitle diambil dari hasil yang sama.
+    Dict hasil dipakai bersama, jangan diubah.
+    """
+    ffprobe = find_ffprobe(ffmpeg_bin) or "ffprobe"
+    path = os.path.abspath(inp)
+    st = os.stat(path)
+    return _probe_info(ffprobe, path, st.st_mtime_ns, st.st_size)
@@ -0,0 +1,19 @@
+import os, subprocess
+
+CREATE_NO_WINDOW = 0x08000000
+STARTF_USESHOWWINDOW = 0x00000001
+SW_HIDE = 0
+
+
+def _no_console_kw() -> dict:
+    if os.name != "nt":
+        return {}
+    si = subprocess.STARTUPINFO()
+    si.dwFlags |= STARTF_USESHOWWINDOW
+    si.wShowWindow = SW_HIDE
+    return {"startupinfo": si, "creationflags": CREATE_NO_WINDOW}
+
+
+# kwargs untuk Popen/run/check_output/create_subprocess_exec:
+# ffmpeg/ffprobe tanpa jendela console di Windows, kosong di OS lain
+POPEN_KW = _no_console_kw()
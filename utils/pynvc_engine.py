@@ -0,0 +1,86 @@
+import os
+from fractions import Fraction
+from typing import List, Tuple
+
+try:
+    import numpy as np
+    import PyNvCodec as nvc
+except Exception:
+    np = None
+    nvc = None
+
+
+def available() -> bool:
+    return nvc is not None
+
+
+def encode_ladder_pynvc(
+    inp: str,
+    targets: List[Tuple[int, int, int, str]],
+    outdir: str,
+    fps: str,
+    codec: str = "h264",
+    preset: str = "P4",
+    gop: int = 48,
+    gpu_id: int = 0,
+) -> List[str]:
+    """
+    Decode sumber SEKALI via NVDEC, resize + encode semua rendition via NVENC.
+    targets: [(w,h,br,name)] besar->kecil (sama dengan encode.build_targets).
+    fps: avg_frame_rate hasil probe ("num/den"), sumber harus CFR; nilai yang
+    sama dipakai `-framerate` saat remux ES supaya timing encoder = timestamp.
+    Return: path elementary stream per target.
+    Audio & packaging HLS/DASH tetap lewat ffmpeg (-c copy).
+    """
+    if nvc is None:
+        raise RuntimeError("PyNvCodec tidak tersedia")
+    rate = Fraction(fps)
+    if rate.denominator != 1:
+        # PyNvEncoder hanya menerima fps integer (frameRateDen = 1)
+        raise RuntimeError(f"fps non-integer ({fps}) tidak didukung PyNvEncoder")
+    os.makedirs(outdir, exist_ok=True)
+
+    dec = nvc.PyNvDecoder(inp, gpu_id)
+    src_w, src_h = dec.Width(), dec.Height()
+    ext = "h264" if codec == "h264" else "hevc"
+
+    encoders, resizers, files, paths = [], [], [], []
+    for w, h, br, _name in targets:
+        cfg = {
+            "preset": preset.upper(),
+            "codec": ext,
+            "s": f"{w}x{h}",
+            "bitrate": str(br),
+            "maxbitrate": str(int(br * 1.07)),
+            "vbvbufsize": str(int(br * 1.07) * 2),
+            "gop": str(gop),
+            "fps": str(rate.numerator),
+        }
+        encoders.append(nvc.PyNvEncoder(cfg, gpu_id))
+        resizers.append(
+            None
+            if (w, h) == (src_w, src_h)
+            else nvc.PySurfaceResizer(w, h, nvc.PixelFormat.NV12, gpu_id)
+        )
+        path = os.path.join(outdir, f"{h}.{ext}")
+        paths.append(path)
+        files.append(open(path, "wb"))
+
+    pkt = np.ndarray(shape=(0,), dtype=np.uint8)
+    try:
+        while True:
+            surf = dec.DecodeSingleSurface()
+            if surf.Empty():
+                break
+            # satu frame decode -> dipakai semua rendition (tetap di VRAM)
+            for enc, rs, f in zip(encoders, resizers, files):
+                s = rs.Execute(surf) if rs else surf
+                if enc.EncodeSingleSurface(s, pkt):
+                    f.write(pkt.tobytes())
+        for enc, f in zip(encoders, files):
+            while enc.FlushSinglePacket(pkt):
+                f.write(pkt.tobytes())
+    finally:
+        for f in files:
+            f.close()
+    return paths
@@ -1,24 +1,16 @@
 import os
-import re
-import json
 import shutil
 import subprocess
 from typing import List, Dict
 
+from utils.probe import probe_info
+from utils.proc import POPEN_KW
+
 
 def _ensure_dir(p: str) -> None:
     os.makedirs(p, exist_ok=True)
 
 
-def _ffprobe_bin(ffmpeg_bin: str) -> str:
-    """
-    Cari ffprobe di folder yang sama dengan ffmpeg; jika tidak ada, fallback ke 'ffprobe' di PATH.
-    """
-    d = os.path.dirname(ffmpeg_bin or "")
-    cand = os.path.join(d, "ffprobe.exe" if os.name == "nt" else "ffprobe")
-    return cand if os.path.isfile(cand) else "ffprobe"
-
-
 def srt_to_vtt(
     ffmpeg_bin: str, srt_path: str, outdir: str, basename: str = None
 ) -> str:
@@ -48,29 +40,40 @@ def srt_to_vtt(
     ]
     try:
         subprocess.run(
-            cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+            cmd,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.STDOUT,
+            **POPEN_KW,
         )
         return os.path.abspath(dst)
     except Exception:
-        # 2) Fallback pure-Python
-        with open(srt_path, "r", encoding="utf-8", errors="replace") as f:
-            s = f.read()
-
-        # Normalisasi newline
-        s = s.replace("\r\n", "\n").replace("\r", "\n")
-
-        # Hapus nomor index di awal blok
+        # 2) Fallback pure-Python: satu pass per baris (newline di-normalisasi
+        # oleh mode teks). Nomor index di awal blok dibuang hanya jika baris
+        # berikutnya timestamp; comma -> dot hanya di baris timestamp.
         # Contoh:
         # 12
         # 00:00:01,500 --> 00:00:03,000
-        s = re.sub(r"(?m)^\s*\d+\s*\n(?=\d{2}:\d{2}:\d{2},\d{3}\s-->)", "", s)
-
-        # Ganti comma -> dot di timestamp
-        s = re.sub(r"(\d{2}:\d{2}:\d{2}),(\d{3})", r"\1.\2", s)
+        out = ["WEBVTT\n\n"]
+        pending = None  # baris angka yang belum pasti index atau teks
+        with open(srt_path, "r", encoding="utf-8-sig", errors="replace") as f:
+            for line in f:
+                is_time = "-->" in line
+                if pending is not None:
+                    if not is_time:
+                        out.append(pending)
+                    pending = None
+                if is_time:
+                    out.append(line.replace(",", ".", 2))
+                elif line.strip().isdigit():
+                    pending = line
+                else:
+                    out.append(line)
+        if pending is not None:
+            out.append(pending)
 
-        vtt = "WEBVTT\n\n" + s
         with open(dst, "w", encoding="utf-8") as f:
-            f.write(vtt)
+            f.writelines(out)
         return os.path.abspath(dst)
 
 
@@ -82,22 +85,12 @@ def list_embedded_subs(ffmpeg_bin: str, input_path: str) -> List[Dict]:
     if not os.path.isfile(input_path):
         raise FileNotFoundError(f"Input tidak ditemukan: {input_path}")
 
-    ffprobe = _ffprobe_bin(ffmpeg_bin)
-    cmd = [
-        ffprobe,
-        "-v",
-        "error",
-        "-print_format",
-        "json",
-        "-show_streams",
-        "-select_streams",
-        "s",
-        input_path,
-    ]
-    out = subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT)
-    data = json.loads(out or "{}")
+    # hasil ffprobe yang sama dengan probe_duration_ms (di-cache per file)
+    data = probe_info(ffmpeg_bin, input_path)
     subs = []
     for s in data.get("streams", []):
+        if s.get("codec_type") != "subtitle":
+            continue
         subs.append(
             {
                 "index": s.get("index"),
@@ -121,7 +114,10 @@ def extract_embedded_subs_to_vtt(
     """
     _ensure_dir(outdir)
     subs = list_embedded_subs(ffmpeg_bin, input_path)
-    written = []
+    # (entri hasil, argumen output) per track
+    tracks = []
+    head = [ffmpeg_bin or "ffmpeg", "-hide_banner", "-y", "-i", input_path]
+    taken = set()
 
     for idx, s in enumerate(subs):
         codec = (s.get("codec_name") or "").lower()
@@ -132,35 +128,48 @@ def extract_embedded_subs_to_vtt(
         lang = (s.get("tags", {}).get("language") or "und").strip()
         label = (s.get("tags", {}).get("title") or lang or "Sub").strip()
 
-        # Nama file unik per bahasa (kalau duplicate lang, tambahkan suffix numerik)
+        # Nama file unik per bahasa (kalau duplicate lang, tambahkan suffix numerik);
+        # `taken`: nama yang sudah dipakai di run ini (file-nya belum ada
+        # karena ffmpeg baru jalan setelah semua track dikumpulkan)
         out_name = f"{basename}.{lang}.vtt"
-        dst = os.path.join(outdir, out_name)
-        if os.path.isfile(dst):
+        if out_name in taken or os.path.isfile(os.path.join(outdir, out_name)):
             # Tambahkan counter biar tidak timpa
             k = 2
-            while os.path.isfile(os.path.join(outdir, f"{basename}.{lang}.{k}.vtt")):
+            while True:
+                out_name = f"{basename}.{lang}.{k}.vtt"
+                if out_name not in taken and not os.path.isfile(
+                    os.path.join(outdir, out_name)
+                ):
+                    break
                 k += 1
-            out_name = f"{basename}.{lang}.{k}.vtt"
-            dst = os.path.join(outdir, out_name)
+        taken.add(out_name)
 
         # map argumen stream
         # Prefer index absolut (0:<index>), fallback 0:s:<order>
         map_arg = f"0:{s['index']}" if s.get("index") is not None else f"0:s:{idx}"
-        cmd = [
-            ffmpeg_bin or "ffmpeg",
-            "-hide_banner",
-            "-y",
-            "-i",
-            input_path,
-            "-map",
-            map_arg,
-            "-c:s",
-            "webvtt",
-            dst,
-        ]
-        subprocess.run(cmd, check=True)
-
-        written.append({"lang": lang, "label": label, "vtt": out_name})
+        out_args = ["-map", map_arg, "-c:s", "webvtt", os.path.join(outdir, out_name)]
+        tracks.append(({"lang": lang, "label": label, "vtt": out_name}, out_args))
+
+    if tracks:
+        # semua track dalam satu ffmpeg: satu demux, satu output per -map
+        cmd = list(head)
+        for _entry, out_args in tracks:
+            cmd += out_args
+        try:
+            subprocess.run(cmd, check=True, **POPEN_KW)
+        except subprocess.CalledProcessError:
+            # satu track rusak/ditolak encoder webvtt menggagalkan semua output:
+            # ulang per track, simpan yang berhasil saja
+            for _entry, out_args in tracks:
+                try:
+                    subprocess.run(head + out_args, check=True, **POPEN_KW)
+                except subprocess.CalledProcessError:
+                    try:
+                        os.remove(out_args[-1])
+                    except OSError:
+                        pass
+    # hanya file yang benar-benar dihasilkan ffmpeg
+    written = [entry for entry, out_args in tracks if os.path.isfile(out_args[-1])]
 
     # Kompat: jika hanya ada 1 VTT, salin menjadi <basename>.vtt untuk player generik
     if len(written) == 1:
@@ -1,12 +1,38 @@
 import os, subprocess
 
+from utils.probe import probe_info
+from utils.proc import POPEN_KW
+
+# preview stream copy hanya kalau sumber sudah "ramah browser" dan tidak terlalu
+# berat; selain itu encode ulang libx264
+PREVIEW_COPY_MAX_BPS = 8_000_000
+
+
+def _preview_copyable(ffmpeg: str, inp: str) -> bool:
+    """H.264 8-bit 4:2:0 dengan bitrate wajar (atau tidak diketahui)."""
+    try:
+        info = probe_info(ffmpeg, inp)
+    except Exception:
+        return False
+    v = next(
+        (s for s in info.get("streams", []) if s.get("codec_type") == "video"), None
+    )
+    if not v or v.get("codec_name") != "h264" or v.get("pix_fmt") != "yuv420p":
+        return False
+    try:
+        bps = int(v.get("bit_rate") or info.get("format", {}).get("bit_rate") or 0)
+    except ValueError:
+        bps = 0
+    return bps <= PREVIEW_COPY_MAX_BPS
+
 
 def poster(ffmpeg: str, inp: str, out_dir: str):
     out = os.path.join(out_dir, "poster.jpg")
     cmd = [
         ffmpeg,
-        "-y",
         "-hide_banner",
+        "-v",
+        "error",
         "-ss",
         "00:00:03",
         "-i",
@@ -15,38 +41,91 @@ def poster(ffmpeg: str, inp: str, out_dir: str):
         "1",
         "-q:v",
         "2",
-        out,
+        "-f",
+        "image2pipe",
+        "-vcodec",
+        "mjpeg",
+        "pipe:1",
     ]
-    subprocess.run(cmd, check=True)
+    # JPEG langsung dari stdout ke memori, ditulis sekali ke disk
+    data = subprocess.run(cmd, stdout=subprocess.PIPE, check=True, **POPEN_KW).stdout
+    with open(out, "wb") as f:
+        f.write(data)
     return out
 
 
 def preview_clip(ffmpeg: str, inp: str, out_dir: str, seconds: int = 6):
     out = os.path.join(out_dir, "preview.mp4")
-    cmd = [
-        ffmpeg,
-        "-y",
-        "-hide_banner",
-        "-ss",
-        "00:00:05",
-        "-t",
-        str(seconds),
-        "-i",
-        inp,
-        "-c:v",
-        "libx264",
-        "-preset",
-        "veryfast",
-        "-crf",
-        "23",
-        "-an",
-        out,
-    ]
-    subprocess.run(cmd, check=True)
+    head = [ffmpeg, "-y", "-hide_banner", "-ss", "00:00:05", "-t", str(seconds)]
+    head += ["-i", inp]
+    tail = ["-an", "-movflags", "+faststart", out]
+    # H.264 yuv420p: stream copy (mulai dari keyframe terdekat, tanpa
+    # decode/encode). HEVC/10-bit/MPEG-2/VC-1 dsb. tetap "sukses" di-copy ke mp4
+    # tapi tidak bisa diputar browser -> encode ulang.
+    if _preview_copyable(ffmpeg, inp):
+        copy = head + ["-c:v", "copy", "-avoid_negative_ts", "make_zero", *tail]
+        rc = subprocess.run(copy, stderr=subprocess.DEVNULL, **POPEN_KW).returncode
+        if rc == 0:
+            return out
+    cmd = head + ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", *tail]
+    subprocess.run(cmd, check=True, **POPEN_KW)
     return out
 
 
-def thumbnails_vtt(ffmpeg: str, inp: str, out_dir: str, every_sec: int = 10):
+def _sprite_filter(every_sec: int, tile_w: int, tile_h: int, cols: int, rows: int):
+    # tile ukuran tetap (letterbox) supaya koordinat xywh bisa dihitung tanpa probe
+    return (
+        f"fps=1/{every_sec},"
+        f"scale={tile_w}:{tile_h}:force_original_aspect_ratio=decrease,"
+        f"pad={tile_w}:{tile_h}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={cols}x{rows}"
+    )
+
+
+def _write_sprite_vtt(
+    out_dir: str, every_sec: int, tile_w: int, tile_h: int, cols: int, rows: int
+):
+    img_dir = os.path.join(out_dir, "thumbs")
+    with os.scandir(img_dir) as it:
+        sprites = sorted(
+            e.name for e in it if e.name.startswith("sprite_") and e.is_file()
+        )
+    per_sprite = cols * rows
+    n = len(sprites) * per_sprite
+    vtt = os.path.join(out_dir, "thumbs.vtt")
+    # batas cue ke-i = i * every_sec; HH:MM:SS supaya video >= 1 jam tetap benar.
+    # Tile kosong di sprite terakhir jatuh setelah durasi video -> tidak pernah tampil.
+    times = [
+        f"{t // 3600:02d}:{t // 60 % 60:02d}:{t % 60:02d}.000"
+        for t in range(0, (n + 1) * every_sec, every_sec)
+    ]
+    cues = []
+    for i in range(n):
+        cell = i % per_sprite
+        x, y = (cell % cols) * tile_w, (cell // cols) * tile_h
+        cues.append(
+            f"{times[i]} --> {times[i + 1]}\n"
+            f"thumbs/{sprites[i // per_sprite]}#xywh={x},{y},{tile_w},{tile_h}\n"
+        )
+    with open(vtt, "w", newline="\n") as f:
+        f.write("WEBVTT\n\n" + "\n".join(cues))
+    return vtt
+
+
+def thumbnails_vtt(
+    ffmpeg: str,
+    inp: str,
+    out_dir: str,
+    every_sec: int = 10,
+    tile_w: int = 160,
+    tile_h: int = 90,
+    cols: int = 10,
+    rows: int = 10,
+):
+    """
+    Thumbnail preview sebagai sprite grid (cols x rows tile per JPEG) + thumbs.vtt
+    dengan fragmen #xywh= -> satu file/GET per cols*rows thumbnail, bukan per frame.
+    """
     img_dir = os.path.join(out_dir, "thumbs")
     os.makedirs(img_dir, exist_ok=True)
     cmd = [
@@ -56,27 +135,48 @@ def thumbnails_vtt(ffmpeg: str, inp: str, out_dir: str, every_sec: int = 10):
         "-i",
         inp,
         "-vf",
-        f"fps=1/{every_sec},scale=320:-1",
+        _sprite_filter(every_sec, tile_w, tile_h, cols, rows),
         "-q:v",
-        "5",
-        os.path.join(img_dir, "thumb_%05d.jpg"),
+        "6",
+        os.path.join(img_dir, "sprite_%03d.jpg"),
     ]
-    subprocess.run(cmd, check=True)
-    images = sorted([f for f in os.listdir(img_dir) if f.endswith(".jpg")])
-    vtt = os.path.join(out_dir, "thumbs.vtt")
-    t = 0
+    subprocess.run(cmd, check=True, **POPEN_KW)
+    return _write_sprite_vtt(out_dir, every_sec, tile_w, tile_h, cols, rows)
 
-    def fmt(s):
-        m = s // 60
-        s = s % 60
-        return f"00:{m:02d}:{s:02d}.000"
 
-    with open(vtt, "w", newline="\n") as f:
-        f.write("WEBVTT\n\n")
-        for img in images:
-            start = fmt(t)
-            end = fmt(t + every_sec)
-            f.write(f"{start} --> {end}\n")
-            f.write(f"thumbs/{img}\n\n")
-            t += every_sec
-    return vtt
+def generate_artifacts(
+    ffmpeg: str,
+    inp: str,
+    out_dir: str,
+    every_sec: int = 10,
+    seconds: int = 6,
+    tile_w: int = 160,
+    tile_h: int = 90,
+    cols: int = 10,
+    rows: int = 10,
+):
+    """
+    Poster + preview + sprite thumbnail dalam SATU proses ffmpeg: sumber di-demux
+    & decode sekali, split=3 ke tiga cabang output.
+    Return: (poster.jpg, preview.mp4, thumbs.vtt).
+    """
+    img_dir = os.path.join(out_dir, "thumbs")
+    os.makedirs(img_dir, exist_ok=True)
+    poster_out = os.path.join(out_dir, "poster.jpg")
+    preview_out = os.path.join(out_dir, "preview.mp4")
+    fc = (
+        "[0:v]split=3[p][c][t];"
+        # trim kedua menghitung frame dari t=3s -> cuma satu frame poster
+        "[p]trim=start=3,setpts=PTS-STARTPTS,trim=end_frame=1[po];"
+        f"[c]trim=start=5:duration={seconds},setpts=PTS-STARTPTS[co];"
+        f"[t]{_sprite_filter(every_sec, tile_w, tile_h, cols, rows)}[to]"
+    )
+    cmd = [ffmpeg, "-y", "-hide_banner", "-i", inp, "-filter_complex", fc]
+    cmd += ["-map", "[po]", "-frames:v", "1", "-update", "1", "-q:v", "2"]
+    cmd += [poster_out]
+    cmd += ["-map", "[co]", "-c:v", "libx264", "-preset", "veryfast", "-crf", "23"]
+    cmd += ["-an", "-movflags", "+faststart", preview_out]
+    cmd += ["-map", "[to]", "-q:v", "6", os.path.join(img_dir, "sprite_%03d.jpg")]
+    subprocess.run(cmd, check=True, **POPEN_KW)
+    vtt = _write_sprite_vtt(out_dir, every_sec, tile_w, tile_h, cols, rows)
+    return poster_out, preview_out, vtt